@@ -1,35 +1,149 @@
 # agent.py
-import anthropic
-import chromadb
-from sentence_transformers import SentenceTransformer
 import json
-import os
+import threading
+
+import anthropic
+
+import config
+import indexer
+import metrics
+from cache import AnalysisCache, data_fingerprint, make_version
+
+# Heavy resources (embedding model, vector store, API client) are created on
+# first use or by warm_up(), so importing this module stays cheap for the CLI
+# tools and tests.
+_lock = threading.RLock()
+_embed_model = None
+_collection = None
+_claude = None
+_async_claude = None
+_cache = None
+_system_blocks = None
+_warmed_up = False
+
+_usage_lock = threading.Lock()
+_usage = {
+    "requests": 0,
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "cache_read_input_tokens": 0,
+}
 
-embed_model = SentenceTransformer('all-MiniLM-L6-v2')
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-#collection = chroma_client.get_collection("dnd_knowledge")
-claude = anthropic.Anthropic()  # reads ANTHROPIC_API_KEY from env
 
-try:
-    collection = chroma_client.get_collection("dnd_knowledge")
+def get_embed_model():
+    """Return the shared SentenceTransformer, loading it on first use."""
+    global _embed_model
+    if _embed_model is None:
+        with _lock:
+            if _embed_model is None:
+                from sentence_transformers import SentenceTransformer
+                _embed_model = SentenceTransformer(config.EMBED_MODEL_NAME)
+    return _embed_model
+
+
+def get_collection():
+    """
+    Return the retrieval backend selected by config.RETRIEVAL_BACKEND,
+    building it from dnd_data/ if missing. Both backends answer
+    query(query_embeddings=..., n_results=...) in Chroma's result layout.
+    """
+    global _collection
+    if _collection is None:
+        with _lock:
+            if _collection is None:
+                if config.RETRIEVAL_BACKEND == "numpy":
+                    _collection = _load_numpy_index()
+                elif config.RETRIEVAL_BACKEND == "chroma":
+                    _collection = _load_collection()
+                else:
+                    raise ValueError(f"Unknown retrieval backend: {config.RETRIEVAL_BACKEND!r}")
+    return _collection
+
+
+def _load_collection():
+    import chromadb
+
+    summary = indexer.sync_index("chroma", get_embed_model=get_embed_model)
+    if summary["changed"]:
+        print(f"Indexed {summary['added']} new documents, removed {summary['deleted']}")
+    chroma_client = chromadb.PersistentClient(path=config.CHROMA_PATH)
+    collection = chroma_client.get_collection(config.COLLECTION_NAME)
     print("Loaded existing vector store")
-except:
-    print("Building vector store...")
-    collection = chroma_client.create_collection("dnd_knowledge")
-    docs = []
-    ids = []
-    data_dir = os.path.join(os.path.dirname(__file__), "dnd_data")
-    for filename in os.listdir(data_dir):
-        if filename.endswith(".json"):
-            with open(os.path.join(data_dir, filename)) as f:
-                entries = json.load(f)
-                for i, entry in enumerate(entries):
-                    text = json.dumps(entry)
-                    docs.append(text)
-                    ids.append(f"{filename}_{i}")
-    embeddings = embed_model.encode(docs).tolist()
-    collection.add(documents=docs, embeddings=embeddings, ids=ids)
-    print(f"Indexed {len(docs)} documents")
+    return collection
+
+
+def _load_numpy_index():
+    from vector_index import NumpyIndex
+
+    summary = indexer.sync_index("numpy", get_embed_model=get_embed_model)
+    if summary["changed"]:
+        print(f"Indexed {summary['added']} new documents, removed {summary['deleted']}")
+    index = NumpyIndex(config.NUMPY_INDEX_PATH)
+    print(f"Loaded numpy index ({index.count()} documents)")
+    return index
+
+
+def get_claude():
+    """Return the shared Anthropic client (reads ANTHROPIC_API_KEY from env)."""
+    global _claude
+    if _claude is None:
+        with _lock:
+            if _claude is None:
+                _claude = anthropic.Anthropic()
+    return _claude
+
+
+def get_async_claude():
+    """Return the shared AsyncAnthropic client used by the web app."""
+    global _async_claude
+    if _async_claude is None:
+        with _lock:
+            if _async_claude is None:
+                _async_claude = anthropic.AsyncAnthropic()
+    return _async_claude
+
+
+def get_cache():
+    """Return the analysis cache, keyed to the current prompt, model and data."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                version = make_version(
+                    SYSTEM_PROMPT, config.CLAUDE_MODEL, config.MAX_TOKENS,
+                    config.N_RESULTS, indexer.DOC_FORMAT, data_fingerprint(),
+                    ",".join(config.CACHED_REFERENCE_TYPES),
+                )
+                _cache = AnalysisCache(
+                    config.CACHE_PATH, version,
+                    max_memory=config.CACHE_MEMORY_ITEMS,
+                    max_entries=config.CACHE_MAX_ENTRIES,
+                    ttl=config.CACHE_TTL_SECONDS,
+                )
+    return _cache
+
+
+def warm_up():
+    """
+    Load every heavy resource and run one embedding so the first real
+    request doesn't pay for model initialization.
+    """
+    global _warmed_up
+    get_claude()
+    model = get_embed_model()
+    get_collection()
+    model.encode(["warm-up"])
+    _warmed_up = True
+
+
+def readiness():
+    """Report which of the agent's resources are loaded."""
+    return {
+        "embed_model": _embed_model is not None,
+        "collection": _collection is not None,
+        "warm_up": _warmed_up,
+    }
 
 
 SYSTEM_PROMPT = """You are a D&D Character Analyst. Given a description of a real person, 
@@ -204,29 +318,152 @@ your choices. Return a structured character sheet including:
 Be specific and cite which traits/behaviors map to which D&D elements."""
 
 
+def strip_code_fences(text: str) -> str:
+    """Remove the markdown code fences Claude sometimes wraps JSON in."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]  # Remove ```json
+    elif text.startswith("```"):
+        text = text[3:]  # Remove ```
+    if text.endswith("```"):
+        text = text[:-3]  # Remove trailing ```
+    return text.strip()
+
+
+def cached_result(description: str):
+    """Return the cached model output for this description, or None."""
+    if not config.CACHE_ENABLED:
+        return None
+    return get_cache().get(description)
+
+
+def cache_result(description: str, result: str):
+    """Remember a model output, but only if it parses (bad generations get retried)."""
+    if not config.CACHE_ENABLED:
+        return
+    try:
+        json.loads(strip_code_fences(result))
+    except json.JSONDecodeError:
+        return
+    get_cache().put(description, result)
+
+
 def analyze_person(description: str) -> str:
-    # Retrieve relevant D&D context
-    #print("Retrieving D&D context...")
-    query_embedding = embed_model.encode([description]).tolist()
-    results = collection.query(query_embeddings=query_embedding, n_results=10)
-    context = "\n\n".join(results["documents"][0])
-
-    #print("calling claude api, might take time")
-    response = claude.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=4000,
-        system=SYSTEM_PROMPT,
-        messages=[{
-            "role": "user",
-            "content": f"""## D&D Reference Data:
+    cached = cached_result(description)
+    if cached is not None:
+        return cached
+
+    result = _analyze_uncached(description)
+    cache_result(description, result)
+    return result
+
+
+def system_blocks():
+    """
+    The static prefix of every request: SYSTEM_PROMPT plus the core reference
+    block. The last block carries the cache breakpoint, so with prompt
+    caching enabled the whole prefix is written to the cache once and read
+    back on later calls.
+    """
+    global _system_blocks
+    if _system_blocks is None:
+        blocks = [{"type": "text", "text": SYSTEM_PROMPT}]
+        if config.CACHED_REFERENCE_TYPES:
+            _, docs, metas = indexer.load_documents(config.DATA_DIR)
+            core = [d for d, m in zip(docs, metas) if m.get("type") in config.CACHED_REFERENCE_TYPES]
+            if core:
+                blocks.append({
+                    "type": "text",
+                    "text": "## Core D&D Reference:\n" + "\n".join(f"- {doc}" for doc in core),
+                })
+        if config.PROMPT_CACHING:
+            blocks[-1]["cache_control"] = {"type": "ephemeral"}
+        _system_blocks = blocks
+    return _system_blocks
+
+
+def format_context(documents, metadatas=None):
+    """Bullet list of retrieved chunks, minus those already in the core block."""
+    metadatas = metadatas or [None] * len(documents)
+    lines = []
+    for doc, meta in zip(documents, metadatas):
+        if meta and meta.get("type") in config.CACHED_REFERENCE_TYPES:
+            continue
+        lines.append(f"- {doc}")
+        if len(lines) == config.N_RESULTS:
+            break
+    return "\n".join(lines)
+
+
+def retrieve_contexts(descriptions):
+    """Retrieve reference context for many descriptions with one encode() call."""
+    descriptions = list(descriptions)
+    if not descriptions:
+        return []
+    model = get_embed_model()
+    with metrics.STAGE_SECONDS.time("embed"):
+        query_embeddings = model.encode(descriptions).tolist()
+    # Over-fetch so dropping core-reference chunks still leaves N_RESULTS
+    n_results = config.N_RESULTS * 2 if config.CACHED_REFERENCE_TYPES else config.N_RESULTS
+    collection = get_collection()
+    with metrics.STAGE_SECONDS.time("vector_query"):
+        results = collection.query(query_embeddings=query_embeddings, n_results=n_results)
+    metadatas = results.get("metadatas") or [None] * len(descriptions)
+    return [format_context(docs, metas) for docs, metas in zip(results["documents"], metadatas)]
+
+
+def retrieve_context(description: str) -> str:
+    return retrieve_contexts([description])[0]
+
+
+def build_messages(description: str, context: str):
+    return [{
+        "role": "user",
+        "content": f"""## D&D Reference Data:
 {context}
 
 ## Person Description:
 {description}
 
 Analyze this person and generate their D&D character sheet."""
-        }]
+    }]
+
+
+def request_params(description: str, context: str):
+    """Keyword arguments for messages.create / messages.stream."""
+    return dict(
+        model=config.CLAUDE_MODEL,
+        max_tokens=config.MAX_TOKENS,
+        system=system_blocks(),
+        messages=build_messages(description, context),
     )
-    #print("done")
-    #print(response)
-    return response.content[0].text
\ No newline at end of file
+
+
+def record_usage(usage):
+    """Accumulate token counts (including prompt-cache reads/writes) from a response."""
+    if usage is None:
+        return
+    with _usage_lock:
+        _usage["requests"] += 1
+        for key in ("input_tokens", "output_tokens",
+                    "cache_creation_input_tokens", "cache_read_input_tokens"):
+            _usage[key] += getattr(usage, key, None) or 0
+
+
+def usage_stats():
+    with _usage_lock:
+        out = dict(_usage)
+    cacheable = out["cache_read_input_tokens"] + out["cache_creation_input_tokens"]
+    out["cache_read_ratio"] = (round(out["cache_read_input_tokens"] / cacheable, 4)
+                               if cacheable else 0.0)
+    return out
+
+
+def _analyze_uncached(description: str) -> str:
+    # Retrieve relevant D&D context
+    context = retrieve_context(description)
+
+    with metrics.STAGE_SECONDS.time("llm"):
+        response = get_claude().messages.create(**request_params(description, context))
+    record_usage(response.usage)
+    return response.content[0].text
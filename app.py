@@ -1,76 +1,296 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import (
+    HTMLResponse, FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
+from starlette.requests import Request as HTTPRequest
 from pydantic import BaseModel
+import asyncio
 import json
-import tempfile
-import os
+import re
+import threading
+from urllib.parse import quote
 import uvicorn
-import uuid
-from agent import analyze_person
-from dnd_pdf_filler_simple.generate_character import generate_character_sheet
+import agent
+import config
+import metrics
+import pipeline
+from jobs import JobFailed, JobQueue, JobQueueFull
+from static_assets import StaticAssets, etag_matches
+from dnd_pdf_filler_simple.generate_character import (
+    preload_template, sheet_filename, template_loaded,
+)
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+_warm_up_error = None
+
+
+def _warm_up():
+    """Load the model, vector store and PDF template off the request path."""
+    global _warm_up_error
+    try:
+        preload_template(incremental=config.PDF_OUTPUT == "incremental")
+        agent.warm_up()
+        print("Warm-up complete")
+    except Exception as e:
+        _warm_up_error = str(e)
+        print(f"Warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if config.WARM_UP_ON_STARTUP:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    pipeline.sheet_store().start_sweeper()
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    pipeline.shutdown()
+
+
+job_queue = JobQueue()
+metrics.add_collector(job_queue.collect_metrics)
+assets = StaticAssets()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 class Request(BaseModel):
     description: str
+    flatten: bool = config.PDF_FLATTEN  # read-only sheet with the values drawn in
+    download: bool = False  # respond with the PDF itself instead of a /pdf/ link
+
+@app.get("/ready")
+async def ready():
+    checks = dict(agent.readiness(), pdf_template=template_loaded())
+    is_ready = all(checks.values())
+    body = {"ready": is_ready, "checks": checks}
+    if _warm_up_error:
+        body["error"] = _warm_up_error
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+@app.get("/stats")
+async def stats():
+    out = {"llm_usage": agent.usage_stats()}
+    if config.CACHE_ENABLED:
+        out["analysis_cache"] = agent.get_cache().stats()
+    pdf_pool = pipeline.pdf_stats()
+    if pdf_pool is not None:
+        out["pdf_pool"] = pdf_pool
+    out["pdf_cache"] = pipeline.pdf_cache_stats()
+    out["sheet_store"] = await asyncio.to_thread(pipeline.sheet_store().stats)
+    out["jobs"] = job_queue.stats()
+    return out
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/", response_class=HTMLResponse)
-async def home():
-    return open("index.html").read()
+async def home(http: HTTPRequest):
+    return assets.index_response(http.headers)
+
+
+@app.get("/static/dist/{path:path}")
+async def static_asset(path: str, http: HTTPRequest):
+    response = assets.asset_response(path, http.headers)
+    if response is None:
+        return JSONResponse({"error": "Asset not found"}, status_code=404)
+    return response
+
+
+def _queue_full(e):
+    return JSONResponse({"error": "Too many character requests, try again shortly"},
+                        status_code=429, headers={"Retry-After": str(e.retry_after)})
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: Request):
+    try:
+        job = job_queue.submit(req.description, flatten=req.flatten)
+    except JobQueueFull as e:
+        return _queue_full(e)
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}",
+            "position": job_queue.position(job)}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return job.to_dict(job_queue.position(job))
+
+
+@app.delete("/jobs/{job_id}")
+async def release_job(job_id: str):
+    # Gives up the caller's interest in the job; the last one out cancels it
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    job_queue.release(job)
+    return job.to_dict(job_queue.position(job))
+
+
+async def _disconnected(http):
+    # The request body has been read, so the next message is the disconnect
+    while (await http.receive())["type"] != "http.disconnect":
+        pass
+
 
 @app.post("/analyze")
-async def analyze(req: Request):
-    result = analyze_person(req.description)
-    #here is json
-
-    # Strip markdown code fences if present
-    result = result.strip()
-    if result.startswith("```json"):
-        result = result[7:]  # Remove ```json
-    elif result.startswith("```"):
-        result = result[3:]  # Remove ```
-    if result.endswith("```"):
-        result = result[:-3]  # Remove trailing ```
-    result = result.strip()
-    
+async def analyze(req: Request, http: HTTPRequest):
+    # Same contract as before the job queue: wait for the job and answer with its result
     try:
-        character = json.loads(result)
-    except json.JSONDecodeError:
-        return {"error": "Failed to parse character sheet", "raw": result}
-    
-    print(character)
-    print(character['race']['name'])
-    # 2. Save JSON to temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-        json.dump(character, f)
-        temp_json_path = f.name
-        
-    #resultJson = json.load(result)
-    #print(resultJson.race.name)
-    #print(result)
-    # 3. Generate PDF
+        job = job_queue.submit(req.description, flatten=req.flatten, download=req.download)
+    except JobQueueFull as e:
+        return _queue_full(e)
+    waiting = asyncio.ensure_future(job.wait())
+    disconnect = asyncio.ensure_future(_disconnected(http))
     try:
-        pdf_path = generate_character_sheet(temp_json_path, output_folder="/tmp/sheets")
-        final_path = f"/tmp/sheets/{uuid.uuid4()}.pdf"
-        os.rename(pdf_path, final_path)
-        filename = os.path.basename(final_path)
-        return {"pdf_url": f"/pdf/{filename}", "char_race": character['race']['name'], 
-                "class_name": character['classes'][0]['name'], "backstory": character['backstory'], 
-                "charName": character['name']}
-        #return FileResponse(pdf_path, filename=os.path.basename(pdf_path), media_type="application/pdf")
-    except Exception as e:
-        return {"error": "Failed to generate PDF", "details": str(e)}
+        await asyncio.wait({waiting, disconnect}, return_when=asyncio.FIRST_COMPLETED)
     finally:
-        os.unlink(temp_json_path)
-    #return {"character_sheet": result}
+        disconnect.cancel()
+        gone = not waiting.done()
+        if gone:
+            waiting.cancel()
+        # release() frees a finished download job's PDF, so take it first
+        pdf, character = job.pdf, job.character
+        job_queue.release(job)
+    if gone:
+        return Response(status_code=499)  # client went away; nobody reads this
+    try:
+        result = waiting.result()
+    except JobFailed as e:
+        return e.error
+    if req.download:
+        # Rendered in memory and sent as the response body; nothing touches disk
+        return Response(pdf, media_type="application/pdf", headers={
+            "Content-Disposition": _attachment(sheet_filename(character))})
+    return result
+
+
+def _attachment(filename):
+    """
+    Content-Disposition for a download. The name comes from the model, so the
+    plain filename is an ASCII fallback with quotes and control characters
+    stripped, and the real name goes in filename* (RFC 6266).
+    """
+    fallback = filename.encode("ascii", "ignore").decode()
+    fallback = re.sub(r'[^A-Za-z0-9._ -]', "", fallback).strip() or "character_sheet.pdf"
+    if fallback.startswith("_"):
+        fallback = "character" + fallback
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _job_events(job, release=False):
+    """
+    Server-sent events for one job: a "field" event per interesting
+    top-level field as it streams in, then "pdf" with the sheet URL and
+    "done" (or a single "error"). With release, the stream holds one of the
+    job's waiters and gives it up when it ends or the client disconnects.
+    """
+    try:
+        async for event in _follow_job(job):
+            yield event
+    finally:
+        if release:
+            job_queue.release(job)
+
+
+async def _follow_job(job):
+    sent = {}
+    while True:
+        changed = job.changed()  # taken before reading, so no update is missed
+        for key, value in job.fields.items():
+            if sent.get(key) != value:
+                sent[key] = value
+                yield _sse("field", {"key": key, "value": value})
+        if job.status == "failed":
+            yield _sse("error", job.error)
+            return
+        if job.status == "cancelled":
+            yield _sse("error", {"error": "Job cancelled"})
+            return
+        if job.status == "done":
+            yield _sse("pdf", {"pdf_url": job.result["pdf_url"]})
+            yield _sse("done", {})
+            return
+        await changed.wait()
+
+
+def _event_stream(job, release=False):
+    return StreamingResponse(
+        _job_events(job, release),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return _event_stream(job)
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(req: Request):
+    try:
+        job = job_queue.submit(req.description, flatten=req.flatten)
+    except JobQueueFull as e:
+        return _queue_full(e)
+    return _event_stream(job, release=True)
+
+
+# Sheet ids are the SHA-256 of the PDF, so a sheet URL always names the same
+# bytes: the id is a strong ETag and browsers may cache the file for good
+SHEET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class _SheetResponse(FileResponse):
+    """FileResponse for a pinned sheet; unpins it however the response ends."""
+
+    def __init__(self, store, sheet_id, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.store = store
+        self.sheet_id = sheet_id
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Also after a 416, which FileResponse sends without running
+            # background tasks, and after an aborted download
+            self.store.unpin(self.sheet_id)
 
 
 @app.get("/pdf/{filename}")
-async def serve_pdf(filename: str):
-    return FileResponse(f"/tmp/sheets/{filename}", media_type="application/pdf")
+async def serve_pdf(filename: str, http: HTTPRequest):
+    store = pipeline.sheet_store()
+    sheet_id = filename.removesuffix(".pdf")
+    path = store.path(sheet_id)  # None for malformed ids without touching the disk
+    if path is None:
+        return JSONResponse({"error": "Sheet not found"}, status_code=404,
+                            headers={"Cache-Control": "no-store"})
+    headers = {"ETag": f'"{sheet_id}"', "Cache-Control": SHEET_CACHE_CONTROL}
+    if_none_match = http.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range/If-Range requests (206, multipart ranges,
+    # 416) for viewers that load the PDF incrementally. Pinned until the
+    # response has been sent, so a sweep can't remove it mid-download.
+    store.pin(sheet_id)
+    return _SheetResponse(store, sheet_id, path, media_type="application/pdf", headers=headers)
+
+
+# Mounted after the routes so /static/dist/ is served by static_asset() above
+app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
 if __name__ == "__main__":
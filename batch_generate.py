@@ -0,0 +1,258 @@
+# batch_generate.py
+# Bulk, offline character generation from a JSONL file of descriptions.
+#
+# Each input line is {"id": ..., "description": ...} ("request_id"/"body" are
+# accepted too). Retrieval is done in batched encode() calls, Claude calls run
+# with bounded concurrency and retry/backoff, and PDFs are rendered in a
+# render_pool.RenderPool (worker processes with the template preloaded).
+# Items whose descriptions normalize to the same text are generated once;
+# the repeats reuse the first one's result and a copy of its PDF. Every
+# finished item is appended to the output JSONL with its status; ids that
+# succeeded are also appended to a checkpoint file, so an interrupted run
+# picks up where it stopped.
+#
+#   python batch_generate.py descriptions.jsonl --out results.jsonl --pdf-dir sheets/
+#
+# For offline benchmarking, point the SDK at the local stub:
+#   uvicorn stub_anthropic:app --port 8100
+#   ANTHROPIC_BASE_URL=http://127.0.0.1:8100 ANTHROPIC_API_KEY=stub python batch_generate.py ...
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import time
+
+import anthropic
+
+import agent
+import pipeline
+from cache import normalize_description
+from render_pool import RenderPool
+
+RETRYABLE = (
+    anthropic.RateLimitError,
+    anthropic.APIConnectionError,
+    anthropic.APITimeoutError,
+    anthropic.InternalServerError,
+)
+
+
+# ============================================================================
+# INPUT / CHECKPOINT
+# ============================================================================
+
+def read_items(path):
+    """Yield {"id", "description"} dicts from a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            item_id = str(record.get("id") or record.get("request_id") or line_no)
+            description = record.get("description") or record.get("body")
+            if not description:
+                raise ValueError(f"{path}:{line_no}: no description")
+            yield {"id": item_id, "description": description}
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def safe_filename(item_id):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", item_id)[:100] + ".pdf"
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+async def call_claude(client, description, context, semaphore, max_retries):
+    """One messages.create call with exponential backoff; returns (text, attempts)."""
+    params = agent.request_params(description, context)
+    for attempt in range(1, max_retries + 2):
+        try:
+            async with semaphore:
+                response = await client.messages.create(**params)
+            agent.record_usage(response.usage)
+            return response.content[0].text, attempt
+        except RETRYABLE:
+            if attempt > max_retries:
+                raise
+            # 0.5s, 1s, 2s, ... capped at 30s, with jitter
+            await asyncio.sleep(min(30.0, 0.5 * 2 ** (attempt - 1)) * (0.5 + random.random()))
+
+
+async def process_item(item, cached, context, args, client, semaphore, pdf_pool, pdf_slots):
+    # cached: the result the pre-scan in run() found, or None to call Claude
+    started = time.perf_counter()
+    record = {"id": item["id"], "status": "ok", "cached": False, "attempts": 0}
+    text = cached
+    try:
+        if text is not None:
+            record["cached"] = True
+        else:
+            text, record["attempts"] = await call_claude(
+                client, item["description"], context, semaphore, args.max_retries)
+            agent.cache_result(item["description"], text)
+    except Exception as e:
+        record.update(status="llm_error", error=f"{type(e).__name__}: {e}")
+        return record, started
+
+    try:
+        character = pipeline.parse_character(text)
+    except json.JSONDecodeError as e:
+        record.update(status="parse_error", error=str(e), raw=text)
+        return record, started
+    record["character"] = character
+
+    if args.pdf_dir:
+        try:
+            # Wait for a queue slot rather than tripping the pool's limit
+            async with pdf_slots:
+                pdf = await pdf_pool.render(character, **pipeline.pdf_options(args.flatten))
+            filename = await asyncio.to_thread(
+                pipeline.save_sheet, pdf, args.pdf_dir, safe_filename(item["id"]))
+            record["pdf"] = os.path.join(args.pdf_dir, filename)
+        except Exception as e:
+            record.update(status="pdf_error", error=f"{type(e).__name__}: {e}")
+    return record, started
+
+
+async def copy_item(item, source, args):
+    # An item whose description normalizes to an earlier one's: wait for that
+    # item and reuse its outcome instead of calling Claude and rendering again
+    started = time.perf_counter()
+    source_record, _ = await source
+    record = {**source_record, "id": item["id"], "attempts": 0,
+              "duplicate_of": source_record["id"]}
+    if "pdf" in source_record:
+        pdf_path = os.path.join(args.pdf_dir, safe_filename(item["id"]))
+        try:
+            await asyncio.to_thread(shutil.copyfile, source_record["pdf"], pdf_path)
+            record["pdf"] = pdf_path
+        except OSError as e:
+            del record["pdf"]
+            record.update(status="pdf_error", error=f"{type(e).__name__}: {e}")
+    return record, started
+
+
+# ============================================================================
+# RUN
+# ============================================================================
+
+async def run(args):
+    checkpoint_path = args.checkpoint or args.out + ".checkpoint"
+    done = read_checkpoint(checkpoint_path)
+    items = [item for item in read_items(args.input) if item["id"] not in done]
+    print(f"{len(items)} items to process ({len(done)} already done)")
+    if not items:
+        return
+
+    client = agent.get_async_claude().with_options(max_retries=0)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    pdf_pool = None
+    pdf_slots = None
+    if args.pdf_dir:
+        pdf_pool = RenderPool(workers=args.pdf_workers,
+                              max_tasks_per_child=args.pdf_max_tasks_per_child)
+        pdf_slots = asyncio.Semaphore(pdf_pool.max_queue)
+    counts = {}
+    duplicates = 0
+    started = time.perf_counter()
+
+    with open(args.out, "a", encoding="utf-8") as out, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        tasks = []
+        first = {}  # normalized description -> task of the first item with it
+        for start in range(0, len(items), args.batch_size):
+            batch = []
+            repeats = []
+            for item in items[start:start + args.batch_size]:
+                key = normalize_description(item["description"])
+                if key in first:
+                    repeats.append((item, key))
+                else:
+                    first[key] = None
+                    batch.append((item, key))
+            # Cached items don't need retrieval; embed the rest in one call.
+            # Each item is looked up once here and the result handed on.
+            cached = [agent.cached_result(item["description"]) for item, _key in batch]
+            misses = [item for (item, _key), text in zip(batch, cached) if text is None]
+            contexts = await asyncio.to_thread(
+                agent.retrieve_contexts, [item["description"] for item in misses])
+            by_id = {item["id"]: ctx for item, ctx in zip(misses, contexts)}
+            for (item, key), text in zip(batch, cached):
+                first[key] = asyncio.create_task(process_item(
+                    item, text, by_id.get(item["id"], ""), args, client, semaphore, pdf_pool,
+                    pdf_slots))
+                tasks.append(first[key])
+            for item, key in repeats:
+                tasks.append(asyncio.create_task(copy_item(item, first[key], args)))
+            duplicates += len(repeats)
+
+        for finished in asyncio.as_completed(tasks):
+            record, item_started = await finished
+            record["seconds"] = round(time.perf_counter() - item_started, 3)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if record["status"] == "ok":
+                checkpoint.write(record["id"] + "\n")
+                checkpoint.flush()
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            n = sum(counts.values())
+            if n % 10 == 0 or n == len(items):
+                print(f"  {n}/{len(items)} done")
+
+    if pdf_pool is not None:
+        pdf_pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print()
+    print("=" * 60)
+    print(f"Processed {len(items)} items in {elapsed:.1f}s "
+          f"({len(items) / elapsed:.2f} items/s)")
+    for status, n in sorted(counts.items()):
+        print(f"  {status:12s}: {n}")
+    if duplicates:
+        print(f"  duplicates  : {duplicates} (reused an earlier item's result)")
+    usage = agent.usage_stats()
+    print(f"  LLM calls   : {usage['requests']} "
+          f"(cache read {usage['cache_read_input_tokens']} / "
+          f"write {usage['cache_creation_input_tokens']} input tokens)")
+    if pdf_pool is not None:
+        cache = pipeline.pdf_cache_stats()
+        print(f"  PDF dedupe  : {cache['hits']} of {cache['hits'] + cache['misses']} sheets "
+              f"({cache['hit_rate']:.0%}, {cache['saved_seconds']:.1f}s of rendering saved)")
+    print(f"Results: {args.out}")
+    print("=" * 60)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate characters in bulk from a JSONL file")
+    ap.add_argument("input", help="JSONL file with one {id, description} per line")
+    ap.add_argument("--out", default="batch_results.jsonl", help="Output JSONL (appended to)")
+    ap.add_argument("--checkpoint", help="Checkpoint file (default: <out>.checkpoint)")
+    ap.add_argument("--pdf-dir", help="Render a PDF per character into this folder")
+    ap.add_argument("--batch-size", type=int, default=32, help="Descriptions per encode() call")
+    ap.add_argument("--concurrency", type=int, default=8, help="Concurrent Claude calls")
+    ap.add_argument("--max-retries", type=int, default=5, help="Retries per Claude call")
+    ap.add_argument("--flatten", action="store_true",
+                    help="Write read-only PDFs with the values drawn into the pages")
+    ap.add_argument("--pdf-workers", type=int, default=os.cpu_count() or 2,
+                    help="Processes used for PDF rendering")
+    ap.add_argument("--pdf-max-tasks-per-child", type=int,
+                    help="Sheets a PDF worker renders before it is replaced (0: never)")
+    args = ap.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
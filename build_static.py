@@ -0,0 +1,170 @@
+# build_static.py
+# Build the web page's assets into static/dist/ for static_assets.py to serve.
+#
+# Every file under static/ is copied under a content-hashed name (so it can
+# be cached forever), images also get WebP and AVIF variants scaled down to
+# --max-width, and text files (CSS, JS, SVG and index.html with its asset
+# URLs rewritten to the hashed names) get gzip and brotli copies. Pillow and
+# brotli are optional: without them the image variants or .br files are
+# skipped. dist/manifest.json records what was built.
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import config
+
+try:
+    from PIL import Image, ImageSequence, features
+except ImportError:  # no image variants
+    Image = None
+try:
+    import brotli
+except ImportError:  # no .br copies
+    brotli = None
+
+SOURCE_DIR = "static"
+DIST_DIR = config.STATIC_DIST_DIR
+INDEX_PATH = "index.html"
+
+TEXT_TYPES = {".css", ".js", ".svg", ".html"}
+IMAGE_TYPES = {".png", ".jpg", ".jpeg", ".gif"}
+
+
+def _write(rel, data):
+    path = os.path.join(DIST_DIR, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _hashed_name(rel, data):
+    stem, ext = os.path.splitext(rel)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def _compressed(rel, data):
+    """Write gzip/brotli copies of rel that are smaller than it; {encoding: rel}."""
+    copies = {"gzip": (".gz", gzip.compress(data, 9, mtime=0))}
+    if brotli is not None:
+        copies["br"] = (".br", brotli.compress(data, quality=11))
+    encodings = {}
+    for encoding, (suffix, packed) in copies.items():
+        if len(packed) < len(data):
+            _write(rel + suffix, packed)
+            encodings[encoding] = rel + suffix
+    return encodings
+
+
+def _encode_image(im, fmt, quality, animated):
+    buf = io.BytesIO()
+    if animated:
+        # allow_mixed lets each frame be lossy or lossless, whichever is smaller
+        frames = [frame.copy() for frame in ImageSequence.Iterator(im)]
+        frames[0].save(buf, fmt, quality=quality, method=4, allow_mixed=True, save_all=True,
+                       append_images=frames[1:], loop=im.info.get("loop", 0),
+                       duration=[frame.info.get("duration", 100) for frame in frames])
+    else:
+        im.save(buf, fmt, quality=quality, method=4)
+    return buf.getvalue()
+
+
+def _image_variants(rel, data, max_width, quality):
+    """Write WebP/AVIF versions of an image that are smaller than it; {mime type: rel}."""
+    if Image is None:
+        return {}
+    formats = {"image/webp": ("WEBP", ".webp")}
+    if features.check("avif"):
+        formats["image/avif"] = ("AVIF", ".avif")
+    with Image.open(io.BytesIO(data)) as im:
+        animated = getattr(im, "is_animated", False)
+        if animated:
+            formats.pop("image/avif", None)  # animated AVIF support is too patchy
+        elif im.width > max_width:
+            im = im.resize((max_width, round(im.height * max_width / im.width)), Image.LANCZOS)
+        stem = os.path.splitext(rel)[0]
+        variants = {}
+        for mime, (fmt, ext) in formats.items():
+            encoded = _encode_image(im, fmt, quality, animated)
+            if len(encoded) < len(data):
+                _write(stem + ext, encoded)
+                variants[mime] = stem + ext
+    return variants
+
+
+def build(max_width=480, quality=80):
+    """Rebuild static/dist/ and return its manifest."""
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    sources = {}  # static/ path -> hashed dist path
+    assets = {}   # hashed dist path -> {"encodings": ..., "variants": ...}
+    for root, dirs, files in os.walk(SOURCE_DIR):
+        dirs[:] = sorted(d for d in dirs
+                         if os.path.abspath(os.path.join(root, d)) != os.path.abspath(DIST_DIR))
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, SOURCE_DIR).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            hashed = _hashed_name(rel, data)
+            _write(hashed, data)
+            ext = os.path.splitext(name)[1].lower()
+            entry = {"size": len(data)}
+            if ext in TEXT_TYPES:
+                entry["encodings"] = _compressed(hashed, data)
+            elif ext in IMAGE_TYPES:
+                entry["variants"] = _image_variants(hashed, data, max_width, quality)
+            sources[rel] = hashed
+            assets[hashed] = entry
+
+    # Point the page at the hashed files, longest paths first so no path
+    # is rewritten inside a longer one
+    with open(INDEX_PATH, encoding="utf-8") as f:
+        html = f.read()
+    for rel in sorted(sources, key=len, reverse=True):
+        html = html.replace(f"static/{rel}", f"static/dist/{sources[rel]}")
+    index = html.encode("utf-8")
+    _write("index.html", index)
+    index_encodings = _compressed("index.html", index)
+
+    manifest = {
+        "index": {"path": "index.html", "encodings": index_encodings},
+        "sources": sources,
+        "assets": assets,
+    }
+    _write("manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def _dist_size(rel, entry, accept_all):
+    # Bytes a modern browser downloads for one asset
+    if not accept_all:
+        return entry["size"]
+    best = [entry["size"]]
+    for alt in {**entry.get("encodings", {}), **entry.get("variants", {})}.values():
+        best.append(os.path.getsize(os.path.join(DIST_DIR, alt)))
+    return min(best)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build hashed, compressed static assets")
+    ap.add_argument("--max-width", type=int, default=480,
+                    help="Scale images wider than this down for the WebP/AVIF variants")
+    ap.add_argument("--quality", type=int, default=80, help="WebP/AVIF quality (0-100)")
+    args = ap.parse_args()
+
+    if Image is None:
+        print("Pillow not installed: skipping WebP/AVIF variants")
+    if brotli is None:
+        print("brotli not installed: skipping .br copies")
+    manifest = build(args.max_width, args.quality)
+    before = sum(_dist_size(rel, e, False) for rel, e in manifest["assets"].items())
+    after = sum(_dist_size(rel, e, True) for rel, e in manifest["assets"].items())
+    print(f"Built {len(manifest['assets'])} assets into {DIST_DIR}: "
+          f"{before / 1024:.0f} KiB -> {after / 1024:.0f} KiB with the best variants")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,36 @@
 # build_vectorstore.py
-import chromadb
-from sentence_transformers import SentenceTransformer
-import json, os
+# Incrementally (re)build the D&D knowledge base from dnd_data/.
+# Only new or changed entries are embedded; see indexer.py.
+import argparse
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-client = chromadb.PersistentClient(path="./chroma_db")
-collection = client.get_or_create_collection("dnd_knowledge")
+import config
+import indexer
 
-# Load your curated D&D JSON files
-data_dir = "./dnd_data"
-docs = []
-ids = []
-for filename in os.listdir(data_dir):
-    with open(os.path.join(data_dir, filename)) as f:
-        entries = json.load(f)
-        for i, entry in enumerate(entries):
-            text = json.dumps(entry)
-            docs.append(text)
-            ids.append(f"{filename}_{i}")
 
-embeddings = model.encode(docs).tolist()
-collection.add(documents=docs, embeddings=embeddings, ids=ids)
-print(f"Indexed {len(docs)} documents")
\ No newline at end of file
+def main():
+    ap = argparse.ArgumentParser(description="Build or update the D&D vector store")
+    ap.add_argument("--backend", choices=["chroma", "numpy"], default=config.RETRIEVAL_BACKEND,
+                    help="Vector store to build (default: DND_RETRIEVAL_BACKEND)")
+    ap.add_argument("--force", action="store_true",
+                    help="Ignore the manifest and diff against the store contents")
+    ap.add_argument("--batch-size", type=int, default=64, help="Documents per encode() call")
+    ap.add_argument("--check", action="store_true",
+                    help="Only report whether the store is up to date (exit 1 if not)")
+    args = ap.parse_args()
+
+    if args.check:
+        up_to_date = indexer.is_up_to_date(args.backend)
+        print("up to date" if up_to_date else "out of date")
+        raise SystemExit(0 if up_to_date else 1)
+
+    summary = indexer.sync_index(args.backend, force=args.force, batch_size=args.batch_size)
+    if summary["changed"]:
+        print(f"Indexed {summary['documents']} documents "
+              f"({summary['added']} embedded, {summary['deleted']} removed) "
+              f"in {summary['seconds']:.2f}s")
+    else:
+        print(f"No changes ({summary['documents']} documents, {summary['seconds'] * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# cache.py
+# Exact-match cache for analyze_person results.
+#
+# Two tiers: a small in-memory LRU in front of a SQLite table that survives
+# restarts. Keys combine the normalized description with a version string
+# (prompt, model and dnd_data fingerprint), so editing SYSTEM_PROMPT or the
+# reference data naturally misses; stale rows are purged on open.
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import config
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_description(description):
+    """Collapse whitespace/case/unicode differences that don't change meaning."""
+    text = unicodedata.normalize("NFKC", description)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def data_fingerprint(data_dir=None):
+    """Hash of every JSON file in dnd_data/ (names and contents)."""
+    data_dir = data_dir or config.DATA_DIR
+    h = hashlib.sha256()
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith(".json"):
+            h.update(filename.encode())
+            with open(os.path.join(data_dir, filename), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def make_version(*parts):
+    """Combine everything that affects the model output into one short id."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    In-memory LRU + persistent SQLite cache of description -> model output.
+
+    max_memory:  entries kept in the in-process LRU
+    max_entries: rows kept in SQLite (least recently used are evicted)
+    ttl:         seconds a row stays valid after it was written
+    """
+
+    def __init__(self, path, version, max_memory=256, max_entries=5000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.version = version
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    # ------------------------------------------------------------------
+    # SQLite tier
+    # ------------------------------------------------------------------
+
+    def _conn(self):
+        if self._db is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis ("
+                " key TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS analysis_accessed ON analysis (accessed)")
+            # Rows from an older prompt/model/data version can never hit again
+            db.execute("DELETE FROM analysis WHERE version != ?", (self.version,))
+            db.commit()
+            self._db = db
+        return self._db
+
+    def key(self, description):
+        normalized = normalize_description(description)
+        return hashlib.sha256(f"{self.version}\0{normalized}".encode()).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(self, description):
+        """Return the cached output for this description, or None."""
+        key = self.key(description)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            db = self._conn()
+            row = db.execute(
+                "SELECT value, created FROM analysis WHERE key = ? AND version = ?",
+                (key, self.version),
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    db.execute("DELETE FROM analysis WHERE key = ?", (key,))
+                    db.commit()
+                self.misses += 1
+                return None
+
+            db.execute("UPDATE analysis SET accessed = ? WHERE key = ?", (now, key))
+            db.commit()
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def put(self, description, value):
+        """Store a model output for this description."""
+        key = self.key(description)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO analysis (key, version, value, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, value, now, now),
+            )
+            db.execute("DELETE FROM analysis WHERE created < ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM analysis WHERE key IN ("
+                " SELECT key FROM analysis ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            db.commit()
+
+    def invalidate(self):
+        """Drop every cached entry (both tiers)."""
+        with self._lock:
+            self._memory.clear()
+            db = self._conn()
+            db.execute("DELETE FROM analysis")
+            db.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn().execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "persistent_entries": size,
+            }
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or clear the analyze_person cache")
+    ap.add_argument("command", choices=["stats", "clear"])
+    args = ap.parse_args()
+
+    import agent
+    cache = agent.get_cache()
+    if args.command == "clear":
+        cache.invalidate()
+        print(f"Cleared {config.CACHE_PATH}")
+    else:
+        for k, v in cache.stats().items():
+            print(f"{k:20s}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# chunking.py
+# Split the dnd_data/*.json reference files into small, self-contained
+# documents (one class, one background, one trait...) with a compact
+# one-line text rendering. The rendering is what gets embedded and what
+# analyze_person pastes into the prompt, so it carries no JSON syntax.
+
+
+def _join(items):
+    return ", ".join(str(i) for i in items)
+
+
+def _render_class(e):
+    return (f"Class: {e['name']} (primary ability {e.get('primary_ability', '?')}). "
+            f"{e.get('description', '')} "
+            f"Personality: {_join(e.get('personality_markers', []))}. "
+            f"Typical alignments: {_join(e.get('typical_alignments', []))}. "
+            f"Real-world analogues: {_join(e.get('real_world_analogues', []))}.")
+
+
+def _render_background(e):
+    return (f"Background: {e['name']}. {e.get('description', '')} "
+            f"Personality: {_join(e.get('personality_markers', []))}. "
+            f"Real-world analogues: {_join(e.get('real_world_analogues', []))}.")
+
+
+def _render_alignment(e):
+    return (f"Alignment: {e['name']} ({e.get('short', '')}). {e.get('description', '')} "
+            f"Behaviour: {_join(e.get('behavioral_markers', []))}. "
+            f"Examples: {_join(e.get('real_world_examples', []))}.")
+
+
+def _render_ability(e):
+    return (f"Ability: {e['name']} ({e.get('abbreviation', '')}). {e.get('description', '')} "
+            f"High: {_join(e.get('high_score_traits', []))}. "
+            f"Low: {_join(e.get('low_score_traits', []))}. "
+            f"Indicators: {_join(e.get('real_world_indicators', []))}.")
+
+
+def _render_generic(e):
+    parts = []
+    for key, value in e.items():
+        if key == "type":
+            continue
+        if isinstance(value, list):
+            value = _join(value)
+        parts.append(f"{key.replace('_', ' ')}: {value}")
+    return f"{e.get('type', 'entry').replace('_', ' ').capitalize()}: " + "; ".join(parts)
+
+
+_RENDERERS = {
+    "class": _render_class,
+    "background": _render_background,
+    "alignment": _render_alignment,
+    "ability_score": _render_ability,
+}
+
+# traits.json groups: group type -> (item type, text key, label)
+_TRAIT_GROUPS = {
+    "personality_traits": ("personality_trait", "trait", "Personality trait"),
+    "ideals": ("ideal", "ideal", "Ideal"),
+    "bonds": ("bond", "bond", "Bond"),
+    "flaws": ("flaw", "flaw", "Flaw"),
+}
+
+
+def _trait_chunks(group, source):
+    item_type, text_key, label = _TRAIT_GROUPS.get(
+        group["type"], (group["type"], None, group["type"].replace("_", " ").capitalize()))
+    category = group.get("category")
+    for item in group.get("entries", []):
+        text = item.get(text_key) if text_key else None
+        if text is None:
+            yield _render_generic(dict(item, type=item_type)), {"source": source, "type": item_type}
+            continue
+        head = label
+        if category:
+            head += f" ({category})"
+        rendered = f'{head}: "{text}"'
+        if item.get("description"):
+            rendered += f" {item['description']}"
+        if item.get("alignment"):
+            rendered += f" Alignment: {item['alignment']}."
+        if item.get("maps_to"):
+            rendered += f" Maps to: {_join(item['maps_to'])}."
+        meta = {"source": source, "type": item_type, "name": text[:80]}
+        if category:
+            meta["category"] = category
+        yield rendered, meta
+
+
+def chunk_entries(source, entries):
+    """
+    Turn one data file's entries into [(text, metadata), ...].
+
+    Grouped entries (anything with an "entries" list, i.e. traits.json) are
+    split into one chunk per item; everything else is one chunk per entry.
+    """
+    chunks = []
+    for entry in entries:
+        if isinstance(entry.get("entries"), list):
+            chunks.extend(_trait_chunks(entry, source))
+            continue
+        render = _RENDERERS.get(entry.get("type"), _render_generic)
+        meta = {"source": source, "type": entry.get("type", "entry")}
+        if "name" in entry:
+            meta["name"] = entry["name"]
+        chunks.append((render(entry), meta))
+    return chunks
@@ -0,0 +1,87 @@
+# config.py
+# Runtime settings for the agent and web app. Everything can be overridden
+# through environment variables so deployments (Render, local, batch runs)
+# don't need code changes.
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATA_DIR = os.environ.get("DND_DATA_DIR", os.path.join(BASE_DIR, "dnd_data"))
+CHROMA_PATH = os.environ.get("DND_CHROMA_PATH", "./chroma_db")
+COLLECTION_NAME = os.environ.get("DND_COLLECTION", "dnd_knowledge")
+
+EMBED_MODEL_NAME = os.environ.get("DND_EMBED_MODEL", "all-MiniLM-L6-v2")
+CLAUDE_MODEL = os.environ.get("DND_CLAUDE_MODEL", "claude-sonnet-4-20250514")
+MAX_TOKENS = int(os.environ.get("DND_MAX_TOKENS", "4000"))
+N_RESULTS = int(os.environ.get("DND_N_RESULTS", "10"))
+
+# Load the model, vector store and PDF template in a background thread when
+# the web app starts, instead of on the first request.
+WARM_UP_ON_STARTUP = os.environ.get("DND_WARM_UP", "1") == "1"
+
+# Exact-match cache of analyze_person results (see cache.py)
+CACHE_ENABLED = os.environ.get("DND_CACHE", "1") == "1"
+CACHE_PATH = os.environ.get("DND_CACHE_PATH", "./cache/analysis.sqlite3")
+CACHE_MEMORY_ITEMS = int(os.environ.get("DND_CACHE_MEMORY_ITEMS", "256"))
+CACHE_MAX_ENTRIES = int(os.environ.get("DND_CACHE_MAX_ENTRIES", "5000"))
+CACHE_TTL_SECONDS = int(os.environ.get("DND_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Retrieval backend: "chroma" (persistent HNSW collection) or "numpy"
+# (exact search over a memory-mapped matrix, see vector_index.py)
+RETRIEVAL_BACKEND = os.environ.get("DND_RETRIEVAL_BACKEND", "chroma")
+NUMPY_INDEX_PATH = os.environ.get("DND_NUMPY_INDEX_PATH", "./numpy_index")
+
+# Anthropic prompt caching. The system prompt and a stable "core reference"
+# block (every chunk of the listed types, e.g. all classes and alignments)
+# are sent as cacheable system blocks; retrieved chunks of those types are
+# not repeated in the user message.
+PROMPT_CACHING = os.environ.get("DND_PROMPT_CACHING", "1") == "1"
+CACHED_REFERENCE_TYPES = tuple(
+    t.strip() for t in os.environ.get("DND_CACHED_REFERENCE_TYPES", "class,alignment").split(",")
+    if t.strip()
+)
+
+# Per-stage concurrency for the async web pipeline (see pipeline.py)
+EMBED_CONCURRENCY = int(os.environ.get("DND_EMBED_CONCURRENCY", "2"))
+LLM_CONCURRENCY = int(os.environ.get("DND_LLM_CONCURRENCY", "16"))
+PDF_CONCURRENCY = int(os.environ.get("DND_PDF_CONCURRENCY", "2"))
+PDF_EXECUTOR = os.environ.get("DND_PDF_EXECUTOR", "thread")  # "thread" or "process"
+# Process executor only (see render_pool.py): renders queued or running
+# before new ones are refused, and jobs per worker before it is replaced
+# (0 keeps workers for the life of the pool).
+PDF_QUEUE_DEPTH = int(os.environ.get("DND_PDF_QUEUE_DEPTH", "32"))
+PDF_MAX_TASKS_PER_CHILD = int(os.environ.get("DND_PDF_MAX_TASKS_PER_CHILD", "200"))
+
+# Job queue behind /jobs and /analyze (see jobs.py): analyses run at once,
+# jobs waiting before new ones get a 429, and seconds a finished job's
+# result stays available from GET /jobs/{id}.
+JOB_WORKERS = int(os.environ.get("DND_JOB_WORKERS", "8"))
+JOB_QUEUE_DEPTH = int(os.environ.get("DND_JOB_QUEUE_DEPTH", "64"))
+JOB_TTL_SECONDS = int(os.environ.get("DND_JOB_TTL_SECONDS", "900"))
+
+# Rendered sheets kept in memory per process, keyed by a hash of the
+# character JSON, template and generator version (see
+# generate_character.SheetCache); 0 items disables it.
+PDF_CACHE_ITEMS = int(os.environ.get("DND_PDF_CACHE_ITEMS", "64"))
+PDF_CACHE_BYTES = int(os.environ.get("DND_PDF_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Content-addressed store the web app serves sheets from (see sheet_store.py).
+# A background sweeper deletes sheets not stored or served for the TTL and
+# trims the directory to the size cap, oldest first; sheets used in the last
+# SHEETS_MIN_AGE_SECONDS are never deleted.
+SHEETS_DIR = os.environ.get("DND_SHEETS_DIR", "/tmp/sheets")
+SHEETS_TTL_SECONDS = int(os.environ.get("DND_SHEETS_TTL_SECONDS", str(24 * 3600)))
+SHEETS_MAX_BYTES = int(os.environ.get("DND_SHEETS_MAX_BYTES", str(512 * 1024 * 1024)))
+SHEETS_MIN_AGE_SECONDS = int(os.environ.get("DND_SHEETS_MIN_AGE_SECONDS", "600"))
+SHEETS_SWEEP_INTERVAL = int(os.environ.get("DND_SHEETS_SWEEP_INTERVAL", "300"))
+
+# Output of build_static.py: hashed, precompressed copies of static/ and
+# index.html, served by static_assets.py when present.
+STATIC_DIST_DIR = os.environ.get("DND_STATIC_DIST_DIR", os.path.join("static", "dist"))
+
+# How sheets are written: "rewrite" (full PdfWriter output) or "incremental"
+# (template bytes + an incremental update with just the filled fields)
+PDF_OUTPUT = os.environ.get("DND_PDF_OUTPUT", "rewrite")
+# Default for the /analyze "flatten" switch: draw the values into the pages
+# and drop the form (read-only, smaller, renders fast)
+PDF_FLATTEN = os.environ.get("DND_PDF_FLATTEN", "0") == "1"
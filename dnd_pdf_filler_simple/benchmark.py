@@ -0,0 +1,350 @@
+"""
+Benchmarks for the character sheet pipeline.
+
+Times every stage of a sheet separately (template load, build_field_values,
+text fill, set_checkboxes, writer.write) plus the end-to-end
+generate_character_sheet(), for each character in examples/ and for
+synthetic worst cases. Each run is appended to a JSON history file, and
+`compare` flags stages that got slower than a threshold.
+
+Usage:
+    python benchmark.py run --label my-change
+    python benchmark.py compare                 # latest run vs the one before
+    python benchmark.py compare --baseline main --threshold 5
+"""
+
+import json
+import argparse
+import contextlib
+import copy
+import io
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import PyPDF2
+
+import generate_character as gc
+from generate_character import (
+    CANTRIP_FIELDS, SPELL_FIELDS_BY_LEVEL, build_field_values, field_index, fill_text_fields,
+    generate_character_sheet, load_template_writer, set_checkboxes, template_writer,
+)
+
+
+EXAMPLES_DIR = Path(__file__).parent / "examples"
+HISTORY_PATH = Path(__file__).parent / "benchmark_history.json"
+
+
+# ============================================================================
+# SYNTHETIC WORST CASES
+# ============================================================================
+
+def _full_caster_level20(base):
+    # Level 20 wizard with a spell in every cantrip and spell line of page 3
+    c = copy.deepcopy(base)
+    c["name"] = "Synthetic Archmage"
+    c["classes"] = [{"name": "Wizard", "level": 20, "hit_die": 6}]
+    c["ability_scores"] = {"str": 8, "dex": 14, "con": 14, "int": 20, "wis": 12, "cha": 10}
+    c["saving_throws"] = {ability: True for ability in c["ability_scores"]}
+    c["skills"] = {skill: True for skill in gc.SKILL_MAP}
+    c["death_saves"] = {"successes": 2, "failures": 2}
+    c["inspiration"] = True
+    slots = gc.FULL_CASTER_SLOTS[20]
+    c["spellcasting"] = {
+        "class": "Wizard",
+        "ability": "Intelligence",
+        "spell_save_dc": 19,
+        "spell_attack_bonus": 11,
+        "spell_slots": {
+            f"level_{lv}": {"total": slots[lv - 1], "remaining": slots[lv - 1]}
+            for lv in range(1, 10)
+        },
+        "cantrips_known": [
+            {"name": f"Cantrip {i + 1}", "level": 0} for i in range(len(CANTRIP_FIELDS))
+        ],
+        "spells_known": [
+            {"name": f"Level {lv} Spell {i + 1}", "level": lv, "prepared": i % 2 == 0}
+            for lv in range(1, 10)
+            for i in range(len(SPELL_FIELDS_BY_LEVEL[lv]))
+        ],
+    }
+    return c
+
+
+def _long_text(base):
+    # Every free-text field filled with a few kilobytes, three weapons
+    c = copy.deepcopy(base)
+    c["name"] = "Synthetic Chronicler"
+    paragraph = ("The road north was long and the nights were cold, but the company "
+                 "pressed on through rain, ruin and worse. ") * 12
+    c["backstory"] = "\n\n".join([paragraph] * 6)
+    c["allies_and_organizations"] = paragraph * 2
+    c["treasure"] = paragraph
+    c["details"] = {key: paragraph for key in ("personality", "ideal", "bond", "flaw")}
+    c["features_and_traits"] = [f"Feature {i}: {paragraph}" for i in range(20)]
+    c["feats"] = [f"Feat {i}" for i in range(10)]
+    c["equipment"] = [f"Item {i} with a longer description" for i in range(80)]
+    c["languages"] = ["Common", "Dwarvish", "Elvish", "Giant", "Gnomish", "Goblin",
+                      "Halfling", "Orc", "Abyssal", "Celestial", "Draconic", "Infernal"]
+    c["proficiencies"] = [f"Proficiency {i}" for i in range(30)]
+    c["weapons"] = [
+        {"name": f"Weapon {i}", "attack_bonus": 5 + i, "damage": "2d6+3",
+         "damage_type": "slashing"}
+        for i in range(3)
+    ]
+    c["attacks_and_spellcasting"] = paragraph
+    return c
+
+
+SYNTHETIC_CHARACTERS = {
+    "synthetic:full-caster-level20": _full_caster_level20,
+    "synthetic:long-text": _long_text,
+}
+
+
+def load_characters(characters_dir=EXAMPLES_DIR, synthetic=True):
+    """Return {name: character dict} for the examples and the worst cases."""
+    characters = {}
+    for path in sorted(Path(characters_dir).glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            characters[path.name] = json.load(f)
+    if synthetic:
+        base = characters.get("Character.wizard.level3.json") or next(iter(characters.values()))
+        for name, build in SYNTHETIC_CHARACTERS.items():
+            characters[name] = build(base)
+    return characters
+
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+def _time(fn, repeat, setup=None, number=1):
+    # Wall-clock milliseconds per fn(setup()) call over repeat samples; setup
+    # time is not counted. Each sample averages number calls (for stages far
+    # below a millisecond, like timeit's number).
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(arg)
+        samples.append((time.perf_counter() - started) * 1000 / number)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(samples[0], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "repeat": repeat,
+    }
+
+
+def _reset_template_caches():
+    gc._template_bytes = None
+    gc._template_writers.clear()
+    gc._field_indexes.clear()
+
+
+def _filled_writer(text_vals, checkbox_vals):
+    writer = template_writer()
+    fill_text_fields(writer, text_vals)
+    set_checkboxes(writer, checkbox_vals)
+    return writer
+
+
+def bench_template(repeat):
+    """Cold template parse (read + parse + field index) and per-sheet copy."""
+    def cold_load(_):
+        _reset_template_caches()
+        load_template_writer()
+        field_index()
+
+    return {
+        "template/parse": _time(cold_load, max(1, repeat // 5)),
+        "template/load": _time(lambda _: template_writer(), repeat),
+    }
+
+
+def bench_character(name, character, repeat, workdir):
+    """Per-stage and end-to-end timings for one character."""
+    text_vals, checkbox_vals = build_field_values(character)
+    results = {
+        f"build_field_values/{name}": _time(
+            lambda _: build_field_values(character), repeat, number=100),
+        f"fill_text_fields/{name}": _time(
+            lambda writer: fill_text_fields(writer, text_vals), repeat, template_writer),
+        f"set_checkboxes/{name}": _time(
+            lambda writer: set_checkboxes(writer, checkbox_vals), repeat, template_writer),
+        f"write/{name}": _time(
+            lambda writer: writer.write(io.BytesIO()), repeat,
+            lambda: _filled_writer(text_vals, checkbox_vals)),
+    }
+
+    # generate_character_sheet() reads a file and cleans its output folder
+    json_path = Path(workdir) / f"{name.replace(':', '_')}.json"
+    json_path.write_text(json.dumps(character), encoding="utf-8")
+    out_folder = Path(workdir) / "out"
+
+    def end_to_end(_):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_character_sheet(str(json_path), output_folder=str(out_folder))
+
+    results[f"generate_character_sheet/{name}"] = _time(end_to_end, repeat)
+    return results
+
+
+def run_benchmarks(repeat=20, characters_dir=EXAMPLES_DIR, synthetic=True):
+    """Run every benchmark and return {benchmark name: timing stats}."""
+    results = bench_template(repeat)
+    characters = load_characters(characters_dir, synthetic)
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, character in characters.items():
+            results.update(bench_character(name, character, repeat, workdir))
+    return results
+
+
+# ============================================================================
+# HISTORY
+# ============================================================================
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=Path(__file__).parent, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def load_history(path=HISTORY_PATH):
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["runs"]
+
+
+def save_run(results, label=None, path=HISTORY_PATH):
+    """Append one run to the history file and return the stored record."""
+    revision = _git_revision()
+    run = {
+        "label": label or revision or datetime.now().strftime("%Y%m%d-%H%M%S"),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": revision,
+        "python": platform.python_version(),
+        "pypdf2": PyPDF2.__version__,
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "results": results,
+    }
+    runs = load_history(path) + [run]
+    tmp = Path(path).with_suffix(".tmp")
+    tmp.write_text(json.dumps({"runs": runs}, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    return run
+
+
+def _find_run(runs, ref):
+    # ref: a label, or an index into the history (-1 is the latest run)
+    for run in reversed(runs):
+        if run["label"] == ref:
+            return run
+    try:
+        return runs[int(ref)]
+    except (ValueError, IndexError):
+        raise SystemExit(f"No run {ref!r} in the benchmark history")
+
+
+def compare_runs(baseline, current, threshold=10.0):
+    """
+    Compare median times benchmark by benchmark.
+    Returns [(name, baseline_ms, current_ms, change_percent, regressed)]
+    for the benchmarks present in both runs.
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        before, after = old["median_ms"], stats["median_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def _print_results(results):
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':{width}s}  {'median':>10s}  {'min':>10s}  {'p95':>10s}")
+    for name, stats in results.items():
+        print(f"{name:{width}s}  {stats['median_ms']:8.3f}ms  {stats['min_ms']:8.3f}ms  "
+              f"{stats['p95_ms']:8.3f}ms")
+
+
+def _print_comparison(baseline, current, rows, threshold):
+    print(f"Baseline: {baseline['label']} ({baseline['timestamp']})")
+    print(f"Current:  {current['label']} ({current['timestamp']})")
+    print(f"Regression threshold: {threshold:g}% slower (median)")
+    print()
+    width = max([len(row[0]) for row in rows] + [9])
+    for name, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:{width}s}  {before:8.3f}ms -> {after:8.3f}ms  {change:+7.1f}%{flag}")
+    regressions = sum(1 for row in rows if row[4])
+    print()
+    print(f"{regressions} regression(s) in {len(rows)} benchmarks")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the character sheet pipeline")
+    ap.add_argument("--history", default=str(HISTORY_PATH),
+                    help=f"JSON history file (default: {HISTORY_PATH.name} next to this script)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run_ap = sub.add_parser("run", help="Run the benchmarks and append them to the history")
+    run_ap.add_argument("--label", help="Name of this run (default: the git revision)")
+    run_ap.add_argument("--repeat", type=int, default=20, help="Samples per benchmark")
+    run_ap.add_argument("--characters", default=str(EXAMPLES_DIR),
+                        help="Folder of character JSON files (default: examples/)")
+    run_ap.add_argument("--no-synthetic", action="store_true",
+                        help="Skip the synthetic worst-case characters")
+    run_ap.add_argument("--no-save", action="store_true", help="Print only, keep no history")
+
+    cmp_ap = sub.add_parser("compare", help="Flag regressions between two runs")
+    cmp_ap.add_argument("--baseline", default="-2",
+                        help="Label or history index of the baseline run (default: -2)")
+    cmp_ap.add_argument("--current", default="-1",
+                        help="Label or history index of the run to check (default: -1)")
+    cmp_ap.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent slowdown that counts as a regression (default: 10)")
+    args = ap.parse_args()
+
+    if args.command == "run":
+        results = run_benchmarks(args.repeat, args.characters, not args.no_synthetic)
+        _print_results(results)
+        if not args.no_save:
+            run = save_run(results, args.label, args.history)
+            print(f"\nSaved run {run['label']!r} to {args.history}")
+        return 0
+
+    runs = load_history(args.history)
+    if len(runs) < 2 and (args.baseline, args.current) == ("-2", "-1"):
+        raise SystemExit(f"Need two runs in {args.history} to compare")
+    baseline = _find_run(runs, args.baseline)
+    current = _find_run(runs, args.current)
+    rows = compare_runs(baseline, current, args.threshold)
+    _print_comparison(baseline, current, rows, args.threshold)
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,25 @@ using the exact AcroForm field IDs.
 
 import json
 import argparse
+import glob
+import hashlib
+import io
 import os
+import pickle
 import shutil
-import sys
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PyPDF2 import PdfReader, PdfWriter
-from PyPDF2.generic import BooleanObject, NameObject
+from PyPDF2.generic import (
+    ArrayObject, BooleanObject, DecodedStreamObject, DictionaryObject, IndirectObject,
+    NameObject, NullObject, NumberObject, StreamObject, TextStringObject,
+)
 
 
 # ============================================================================
@@ -398,370 +411,1334 @@ def get_spell_slots(class_name, level):
 # CHECKBOX HELPER
 # ============================================================================
 
-def set_checkboxes(writer, checkbox_vals):
+def set_checkboxes(writer, checkbox_vals, pdf_path=None):
     """
-    Toggle checkbox annotations directly in the page tree.
+    Toggle checkbox annotations by direct lookup in the template's field index.
     checkbox_vals: {field_name: bool}
-    
+    writer must come from template_writer(pdf_path).
+
     In this PDF:
     - "on" value = "Yes"
     - "off" value = "Off"
     """
-    for page in writer.pages:
-        if "/Annots" not in page:
-            continue
-        for annot_ref in page["/Annots"]:
-            annot = annot_ref.get_object()
-            field_name = annot.get("/T")
-            if field_name is None:
-                continue
-            field_name = str(field_name)
-            if field_name in checkbox_vals:
-                if checkbox_vals[field_name]:
-                    annot.update({
-                        NameObject("/V"):  NameObject("/Yes"),
-                        NameObject("/AS"): NameObject("/Yes"),
-                    })
-                else:
-                    annot.update({
-                        NameObject("/V"):  NameObject("/Off"),
-                        NameObject("/AS"): NameObject("/Off"),
-                    })
+    index = field_index(pdf_path)
+    for field_name, checked in checkbox_vals.items():
+        state = NameObject("/Yes") if checked else NameObject("/Off")
+        for _page, idnum, is_widget in index.get(field_name, ()):
+            if is_widget:
+                writer._objects[idnum - 1].update({
+                    NameObject("/V"):  state,
+                    NameObject("/AS"): state,
+                })
+
+
+def fill_text_fields(writer, text_vals, pdf_path=None):
+    """
+    Write text values by direct lookup in the template's field index (same
+    result as update_page_form_field_values() on every page, without
+    rescanning the annotations). writer must come from template_writer(pdf_path).
+    """
+    writer.set_need_appearances_writer()
+    index = field_index(pdf_path)
+    for field_name, value in text_vals.items():
+        for _page, idnum, is_widget in index.get(field_name, ()):
+            annot = writer._objects[idnum - 1]
+            if is_widget and annot.get("/FT") == "/Btn":
+                annot[NameObject("/AS")] = NameObject(value)
+            annot[NameObject("/V")] = TextStringObject(value)
 
 
 # ============================================================================
-# BUILD FIELD VALUES
+# FIELD PLAN
 # ============================================================================
+#
+# Every PDF field is described once, as data, in TEXT_FIELD_PLAN and
+# CHECKBOX_PLAN. When the module is imported, compile_field_plan() groups
+# the rows into ordered runs of same-shaped lookups, so filling a character
+# is a few tight loops over prebuilt tuples. build_field_values() runs it
+# plus the spell page step. All three fill scripts share this plan.
+#
+# Text rows:     (pdf field(s), source, default, formatter)
+# Checkbox rows: (pdf field, source, default)
+#
+# source is a key path into the character JSON, e.g. ("player", "name"):
+# missing keys give default (REQUIRED makes them a KeyError instead). A
+# path starting with STATS reads the derived numbers computed once per
+# character by _character_stats() (modifiers, bonuses) instead. source can
+# also be a function (character, stats) -> value; a function may return SKIP
+# to leave the field out (rows doing so take no formatter). formatter (str,
+# format_modifier or None) is applied last.
 
-def build_field_values(character):
-    """
-    Build complete dictionary mapping PDF field names to character values.
-    Returns (text_vals, checkbox_vals)
-    """
-    vals = {}
-    cb = {}  # checkbox values: {field_name: bool}
-    
-    # Get primary class info
+REQUIRED = object()
+SKIP = object()
+STATS = object()
+
+ABILITIES = ("str", "dex", "con", "int", "wis", "cha")
+
+# Class -> spellcasting ability key (for the spell_limit rule)
+CASTING_ABILITY = {
+    "wizard": "int", "artificer": "int",
+    "cleric": "wis", "druid": "wis", "ranger": "wis",
+    "bard": "cha", "sorcerer": "cha", "paladin": "cha", "warlock": "cha",
+}
+
+
+def _character_stats(character):
+    # Derived numbers several fields need, computed once per character
     primary_class = character['classes'][0]
-    class_level = primary_class['level']
-    class_name = primary_class['name']
-    pb = prof_bonus(class_level)
-    
-    # Ability scores
+    level = primary_class['level']
+    pb = prof_bonus(level)
     scores = character['ability_scores']
-    str_score = scores['str']
-    dex_score = scores['dex']
-    con_score = scores['con']
-    int_score = scores['int']
-    wis_score = scores['wis']
-    cha_score = scores['cha']
-    
-    # Ability modifiers
-    str_mod = ability_mod(str_score)
-    dex_mod = ability_mod(dex_score)
-    con_mod = ability_mod(con_score)
-    int_mod = ability_mod(int_score)
-    wis_mod = ability_mod(wis_score)
-    cha_mod = ability_mod(cha_score)
-    
-    mods = {
-        "str": str_mod, "dex": dex_mod, "con": con_mod,
-        "int": int_mod, "wis": wis_mod, "cha": cha_mod
+    mods = {ability: ability_mod(scores[ability]) for ability in ABILITIES}
+    saving_throws = character.get('saving_throws', {})
+    skills = character.get('skills', {})
+    skill_bonuses = {
+        skill_name: skill_bonus(mods[ability], pb, skills.get(skill_name, False))
+        for skill_name, (pdf_field, ability) in SKILL_MAP.items()
     }
-    
-    # ========================================================================
-    # IDENTITY & METADATA
-    # ========================================================================
-    vals['CharacterName'] = character['name']
-    vals['CharacterName 2'] = character['name']  # Page 2/3
-    vals['PlayerName'] = character.get('player', {}).get('name', '')
-    vals['ClassLevel'] = f"{class_name} {class_level}"
-    vals['Background'] = character.get('background', {}).get('name', '')
-    vals['Race '] = character.get('race', {}).get('name', '')  # trailing space!
-    vals['Alignment'] = character.get('alignment', '')
-    vals['XP'] = str(character.get('experience_points', 0))
+    return {
+        "class": primary_class,
+        "level": level,
+        "pb": pb,
+        "mods": mods,
+        "saving_throws": {
+            ability: saving_throw_bonus(mods[ability], pb, saving_throws.get(ability, False))
+            for ability in ABILITIES
+        },
+        "skills": skill_bonuses,
+        "passive_perception": passive_perception(skill_bonuses['Perception']),
+    }
+
+
+def _weapon(i, build):
+    def get(c, s):
+        weapons = c.get('weapons', [])
+        return build(weapons[i]) if len(weapons) > i else SKIP
+    return get
+
+
+def _weapon_damage(w):
+    return f"{w['damage']} {w['damage_type']}"
+
+
+def _proficiencies_text(c, s):
+    prof_text = "Languages: " + ", ".join(c.get('languages', []))
+    proficiencies = c.get('proficiencies', [])
+    if proficiencies:
+        prof_text += "\n\nProficiencies: " + ", ".join(proficiencies)
+    return prof_text
+
+
+def _features_text(c, s):
+    features_text = "\n\n".join(c.get('features_and_traits', []))
+    feats = c.get('feats', [])
+    if feats:
+        features_text += "\n\nFeats:\n" + "\n".join(feats)
+    return features_text
+
+
+def _equipment_text(c, s):
+    equipment = c.get('equipment', [])
+    return "\n".join(equipment) if equipment else SKIP
+
+
+def _death_save(kind, i):
+    return lambda c, s: c.get('death_saves', {}).get(kind, 0) > i
+
+
+TEXT_FIELD_PLAN = [
+    # Identity & metadata
+    (("CharacterName", "CharacterName 2"), ("name",), REQUIRED, None),  # page 1 and 2/3
+    ("PlayerName",   ("player", "name"),     "", None),
+    ("ClassLevel",   lambda c, s: f"{s['class']['name']} {s['level']}", None, None),
+    ("Background",   ("background", "name"), "", None),
+    ("Race ",        ("race", "name"),       "", None),  # trailing space!
+    ("Alignment",    ("alignment",),         "", None),
+    ("XP",           ("experience_points",), 0,  str),
     
     # Physical description (page 2)
-    phys = character.get('physical', {})
-    vals['Age'] = str(phys.get('age', ''))
-    vals['Height'] = str(phys.get('height', ''))
-    vals['Weight'] = str(phys.get('weight', ''))
-    vals['Eyes'] = str(phys.get('eyes', ''))
-    vals['Skin'] = str(phys.get('skin', ''))
-    vals['Hair'] = str(phys.get('hair', ''))
-    
-    # ========================================================================
-    # ABILITY SCORES & MODIFIERS
-    # ========================================================================
-    vals['STR'] = str(str_score)
-    vals['DEX'] = str(dex_score)
-    vals['CON'] = str(con_score)
-    vals['INT'] = str(int_score)
-    vals['WIS'] = str(wis_score)
-    vals['CHA'] = str(cha_score)
-    
-    vals['STRmod'] = format_modifier(str_mod)
-    vals['DEXmod '] = format_modifier(dex_mod)  # trailing space!
-    vals['CONmod'] = format_modifier(con_mod)
-    vals['INTmod'] = format_modifier(int_mod)
-    vals['WISmod'] = format_modifier(wis_mod)
-    vals['CHamod'] = format_modifier(cha_mod)  # PDF typo: "CHa" not "CHA"
-    
-    # ========================================================================
-    # PROFICIENCY BONUS & INSPIRATION
-    # ========================================================================
-    vals['ProfBonus'] = format_modifier(pb)
-    vals['Inspiration'] = '1' if character.get('inspiration', False) else ''
-    
-    # ========================================================================
-    # SAVING THROWS (text values + checkboxes)
-    # ========================================================================
-    st = character.get('saving_throws', {})
-    
-    # Text fields
-    vals['ST Strength'] = format_modifier(saving_throw_bonus(str_mod, pb, st.get('str', False)))
-    vals['ST Dexterity'] = format_modifier(saving_throw_bonus(dex_mod, pb, st.get('dex', False)))
-    vals['ST Constitution'] = format_modifier(saving_throw_bonus(con_mod, pb, st.get('con', False)))
-    vals['ST Intelligence'] = format_modifier(saving_throw_bonus(int_mod, pb, st.get('int', False)))
-    vals['ST Wisdom'] = format_modifier(saving_throw_bonus(wis_mod, pb, st.get('wis', False)))
-    vals['ST Charisma'] = format_modifier(saving_throw_bonus(cha_mod, pb, st.get('cha', False)))
-    
-    # Checkboxes
-    for checkbox_name, ability_key in ST_CHECKBOX_TO_ABILITY.items():
-        cb[checkbox_name] = st.get(ability_key, False)
-    
-    # ========================================================================
-    # SKILLS (text values + checkboxes)
-    # ========================================================================
-    skills = character.get('skills', {})
+    ("Age",    ("physical", "age"),    "", str),
+    ("Height", ("physical", "height"), "", str),
+    ("Weight", ("physical", "weight"), "", str),
+    ("Eyes",   ("physical", "eyes"),   "", str),
+    ("Skin",   ("physical", "skin"),   "", str),
+    ("Hair",   ("physical", "hair"),   "", str),
     
-    for skill_name, (pdf_field, ability_key) in SKILL_MAP.items():
-        is_proficient = skills.get(skill_name, False)
-        bonus = skill_bonus(mods[ability_key], pb, is_proficient)
-        vals[pdf_field] = format_modifier(bonus)
-    
-    # Skill proficiency checkboxes
-    for checkbox_name, skill_name in SKILL_CHECKBOX_TO_SKILL.items():
-        cb[checkbox_name] = skills.get(skill_name, False)
-    
-    # Passive Perception
-    perception_prof = skills.get('Perception', False)
-    perception_bonus = skill_bonus(wis_mod, pb, perception_prof)
-    vals['Passive'] = str(passive_perception(perception_bonus))
-    
-    # ========================================================================
-    # COMBAT STATS
-    # ========================================================================
-    vals['AC'] = str(character.get('armor_class', {}).get('value', 10))
-    vals['Initiative'] = format_modifier(character.get('initiative_bonus', dex_mod))
-    vals['Speed'] = str(character.get('speed', {}).get('Walk', 30))
-    
-    hp = character.get('hit_points', {})
-    vals['HPMax'] = str(hp.get('max', 0))
-    vals['HPCurrent'] = str(hp.get('current', hp.get('max', 0)))
-    vals['HPTemp'] = str(hp.get('temp', 0))
-    
-    hd = character.get('hit_dice', {})
-    vals['HDTotal'] = str(hd.get('total', ''))
-    vals['HD'] = str(hd.get('current', ''))
-    
-    # ========================================================================
-    # DEATH SAVES (checkboxes)
-    # ========================================================================
-    ds = character.get('death_saves', {})
-    successes = ds.get('successes', 0)
-    failures = ds.get('failures', 0)
-    
-    for i, checkbox_name in enumerate(DEATH_SAVE_CHECKBOXES['success']):
-        cb[checkbox_name] = (i < successes)
-    for i, checkbox_name in enumerate(DEATH_SAVE_CHECKBOXES['failure']):
-        cb[checkbox_name] = (i < failures)
-    
-    # ========================================================================
-    # CURRENCY
-    # ========================================================================
-    currency = character.get('currency', {})
-    vals['CP'] = str(currency.get('cp', 0))
-    vals['SP'] = str(currency.get('sp', 0))
-    vals['EP'] = str(currency.get('ep', 0))
-    vals['GP'] = str(currency.get('gp', 0))
-    vals['PP'] = str(currency.get('pp', 0))
-    
-    # ========================================================================
-    # WEAPONS
-    # ========================================================================
-    weapons = character.get('weapons', [])
-    
-    if len(weapons) > 0:
-        w = weapons[0]
-        vals['Wpn Name'] = w['name']
-        vals['Wpn1 AtkBonus'] = format_modifier(w['attack_bonus'])
-        vals['Wpn1 Damage'] = f"{w['damage']} {w['damage_type']}"
-    
-    if len(weapons) > 1:
-        w = weapons[1]
-        vals['Wpn Name 2'] = w['name']
-        vals['Wpn2 AtkBonus '] = format_modifier(w['attack_bonus'])  # trailing space
-        vals['Wpn2 Damage '] = f"{w['damage']} {w['damage_type']}"   # trailing space
-    
-    if len(weapons) > 2:
-        w = weapons[2]
-        vals['Wpn Name 3'] = w['name']
-        vals['Wpn3 AtkBonus  '] = format_modifier(w['attack_bonus'])  # two trailing spaces
-        vals['Wpn3 Damage '] = f"{w['damage']} {w['damage_type']}"    # trailing space
-    
-    vals['AttacksSpellcasting'] = character.get('attacks_and_spellcasting', '')
-    
-    # ========================================================================
-    # PERSONALITY & ROLEPLAY
-    # ========================================================================
-    details = character.get('details', {})
-    vals['PersonalityTraits '] = details.get('personality', '')  # trailing space!
-    vals['Ideals'] = details.get('ideal', '')
-    vals['Bonds'] = details.get('bond', '')
-    vals['Flaws'] = details.get('flaw', '')
-    
-    vals['Backstory'] = character.get('backstory', '')
-    vals['Allies'] = character.get('allies_and_organizations', '')
-    vals['Treasure'] = character.get('treasure', '')
-    
-    faction = character.get('faction', {})
-    vals['FactionName'] = faction.get('name', '')
-    
-    # ========================================================================
-    # PROFICIENCIES & LANGUAGES
-    # ========================================================================
-    languages = character.get('languages', [])
-    proficiencies = character.get('proficiencies', [])
-    
-    prof_text = "Languages: " + ", ".join(languages)
-    if proficiencies:
-        prof_text += "\n\nProficiencies: " + ", ".join(proficiencies)
+    # Ability scores & modifiers
+    *[(ability.upper(), ("ability_scores", ability), REQUIRED, str) for ability in ABILITIES],
+    ("STRmod",  (STATS, "mods", "str"), REQUIRED, format_modifier),
+    ("DEXmod ", (STATS, "mods", "dex"), REQUIRED, format_modifier),  # trailing space!
+    ("CONmod",  (STATS, "mods", "con"), REQUIRED, format_modifier),
+    ("INTmod",  (STATS, "mods", "int"), REQUIRED, format_modifier),
+    ("WISmod",  (STATS, "mods", "wis"), REQUIRED, format_modifier),
+    ("CHamod",  (STATS, "mods", "cha"), REQUIRED, format_modifier),  # PDF typo: "CHa" not "CHA"
     
-    vals['ProficienciesLang'] = prof_text
+    # Proficiency bonus & inspiration
+    ("ProfBonus",   (STATS, "pb"), REQUIRED, format_modifier),
+    ("Inspiration", lambda c, s: '1' if c.get('inspiration', False) else '', None, None),
     
-    # ========================================================================
-    # FEATURES & TRAITS
-    # ========================================================================
-    features = character.get('features_and_traits', [])
-    feats = character.get('feats', [])
+    # Saving throws
+    ("ST Strength",     (STATS, "saving_throws", "str"), REQUIRED, format_modifier),
+    ("ST Dexterity",    (STATS, "saving_throws", "dex"), REQUIRED, format_modifier),
+    ("ST Constitution", (STATS, "saving_throws", "con"), REQUIRED, format_modifier),
+    ("ST Intelligence", (STATS, "saving_throws", "int"), REQUIRED, format_modifier),
+    ("ST Wisdom",       (STATS, "saving_throws", "wis"), REQUIRED, format_modifier),
+    ("ST Charisma",     (STATS, "saving_throws", "cha"), REQUIRED, format_modifier),
     
-    features_text = "\n\n".join(features)
-    if feats:
-        features_text += "\n\nFeats:\n" + "\n".join(feats)
+    # Skills
+    *[(pdf_field, (STATS, "skills", skill_name), REQUIRED, format_modifier)
+      for skill_name, (pdf_field, ability) in SKILL_MAP.items()],
+    ("Passive", (STATS, "passive_perception"), REQUIRED, str),
     
-    vals['Feat+Traits'] = features_text
-    vals['Features and Traits'] = features_text
+    # Combat stats
+    ("AC",         ("armor_class", "value"), 10, str),
+    ("Initiative", lambda c, s: c.get('initiative_bonus', s["mods"]["dex"]), None,
+     format_modifier),
+    ("Speed",      ("speed", "Walk"), 30, str),
+    ("HPMax",      ("hit_points", "max"), 0, str),
+    ("HPCurrent",  lambda c, s: c.get('hit_points', {}).get(
+        'current', c.get('hit_points', {}).get('max', 0)), None, str),
+    ("HPTemp",     ("hit_points", "temp"), 0, str),
+    ("HDTotal",    ("hit_dice", "total"), "", str),
+    ("HD",         ("hit_dice", "current"), "", str),
     
-    # ========================================================================
-    # EQUIPMENT
-    # ========================================================================
-    equipment = character.get('equipment', [])
-    if equipment:
-        vals['Equipment'] = "\n".join(equipment)
+    # Currency
+    *[(coin.upper(), ("currency", coin), 0, str) for coin in ("cp", "sp", "ep", "gp", "pp")],
     
-    # ========================================================================
-    # SPELLCASTING (PAGE 3)
-    # ========================================================================
-    spellcasting = character.get('spellcasting')
+    # Weapons (exact PDF field names, trailing spaces included)
+    ("Wpn Name",        _weapon(0, lambda w: w['name']), None, None),
+    ("Wpn1 AtkBonus",   _weapon(0, lambda w: format_modifier(w['attack_bonus'])), None, None),
+    ("Wpn1 Damage",     _weapon(0, _weapon_damage), None, None),
+    ("Wpn Name 2",      _weapon(1, lambda w: w['name']), None, None),
+    ("Wpn2 AtkBonus ",  _weapon(1, lambda w: format_modifier(w['attack_bonus'])), None, None),
+    ("Wpn2 Damage ",    _weapon(1, _weapon_damage), None, None),
+    ("Wpn Name 3",      _weapon(2, lambda w: w['name']), None, None),
+    ("Wpn3 AtkBonus  ", _weapon(2, lambda w: format_modifier(w['attack_bonus'])), None, None),
+    ("Wpn3 Damage ",    _weapon(2, _weapon_damage), None, None),
+    ("AttacksSpellcasting", ("attacks_and_spellcasting",), "", None),
+    
+    # Personality & roleplay
+    ("PersonalityTraits ", ("details", "personality"), "", None),  # trailing space!
+    ("Ideals",      ("details", "ideal"), "", None),
+    ("Bonds",       ("details", "bond"),  "", None),
+    ("Flaws",       ("details", "flaw"),  "", None),
+    ("Backstory",   ("backstory",), "", None),
+    ("Allies",      ("allies_and_organizations",), "", None),
+    ("Treasure",    ("treasure",), "", None),
+    ("FactionName", ("faction", "name"), "", None),
+    
+    # Proficiencies, features, equipment
+    ("ProficienciesLang", _proficiencies_text, None, None),
+    (("Feat+Traits", "Features and Traits"), _features_text, None, None),
+    ("Equipment", _equipment_text, None, None),
+]
+
+CHECKBOX_PLAN = [
+    *[(checkbox_name, ("saving_throws", ability), False)
+      for checkbox_name, ability in ST_CHECKBOX_TO_ABILITY.items()],
+    *[(checkbox_name, ("skills", skill_name), False)
+      for checkbox_name, skill_name in SKILL_CHECKBOX_TO_SKILL.items()],
+    *[(checkbox_name, _death_save('successes', i), None)
+      for i, checkbox_name in enumerate(DEATH_SAVE_CHECKBOXES['success'])],
+    *[(checkbox_name, _death_save('failures', i), None)
+      for i, checkbox_name in enumerate(DEATH_SAVE_CHECKBOXES['failure'])],
+]
+
+
+# Row kinds of a compiled plan. Consecutive rows of one kind (and, for
+# two-key paths, the same first key) form a run that _fill_runs() handles
+# in one tight loop: no call per row, and a shared prefix such as
+# character["physical"] or stats["skills"] is looked up once per run.
+_CALL, _STAT, _STAT2, _KEY, _KEY2, _GET, _GET2, _ALIAS = range(8)
+
+
+def _compile_row(field, source, default, formatter):
+    # (kind, shared first key or None, row); see _fill_runs() for layouts
+    if not callable(source):
+        stats = source[0] is STATS
+        path = source[1:] if stats else source
+        if stats:
+            if len(path) == 1:
+                return _STAT, None, (field, path[0], formatter)
+            if len(path) == 2:
+                return _STAT2, path[0], (field, path[1], formatter)
+        elif default is REQUIRED:
+            if len(path) == 1:
+                return _KEY, None, (field, path[0], formatter)
+            if len(path) == 2:
+                return _KEY2, path[0], (field, path[1], formatter)
+        elif len(path) == 1:
+            return _GET, None, (field, path[0], default, formatter)
+        elif len(path) == 2:
+            return _GET2, path[0], (field, path[1], default, formatter)
+        source = _walk(stats, path, default)
+    return _CALL, None, (field, source, formatter)
+
+
+def _walk(stats, path, default):
+    # Getter for key paths longer than two keys (none in the plan today)
+    required = stats or default is REQUIRED
+    *outer, last = path
+    
+    def get(c, s):
+        d = s if stats else c
+        for key in outer:
+            d = d[key] if required else d.get(key, {})
+        return d[last] if required else d.get(last, default)
+    return get
+
+
+def _fill_runs(runs, c, s, out):
+    for kind, a, rows in runs:
+        if kind == _STAT2:
+            d = s[a]
+            for field, b, f in rows:
+                v = d[b]
+                out[field] = v if f is None else f(v)
+        elif kind == _GET2:
+            d = c.get(a, {})
+            for field, b, default, f in rows:
+                v = d.get(b, default)
+                out[field] = v if f is None else f(v)
+        elif kind == _GET:
+            for field, b, default, f in rows:
+                v = c.get(b, default)
+                out[field] = v if f is None else f(v)
+        elif kind == _CALL:
+            for field, get, f in rows:
+                v = get(c, s)
+                if f is not None:
+                    out[field] = f(v)
+                elif v is not SKIP:
+                    out[field] = v
+        elif kind == _KEY2:
+            d = c[a]
+            for field, b, f in rows:
+                v = d[b]
+                out[field] = v if f is None else f(v)
+        elif kind == _KEY:
+            for field, b, f in rows:
+                v = c[b]
+                out[field] = v if f is None else f(v)
+        elif kind == _STAT:
+            for field, b, f in rows:
+                v = s[b]
+                out[field] = v if f is None else f(v)
+        else:  # _ALIAS: same value as an earlier field
+            for field, first in rows:
+                if first in out:
+                    out[field] = out[first]
+
+
+def _runs(rows):
+    # Group consecutive (kind, key, row) triples into (kind, key, [rows]),
+    # keeping plan order
+    runs = []
+    for kind, key, row in rows:
+        if runs and runs[-1][0] == kind and runs[-1][1] == key:
+            runs[-1][2].append(row)
+        else:
+            runs.append((kind, key, [row]))
+    return runs
+
+
+def compile_field_plan(text_plan=TEXT_FIELD_PLAN, checkbox_plan=CHECKBOX_PLAN):
+    """
+    Compile the plan tables into one function (character, stats) ->
+    (text_vals, checkbox_vals). Rows are resolved once into runs of
+    same-shaped lookups, so filling a character does no per-row dispatch.
+    """
+    text_rows = []
+    for fields, source, default, formatter in text_plan:
+        if isinstance(fields, str):
+            fields = (fields,)
+        first, *rest = fields
+        text_rows.append(_compile_row(first, source, default, formatter))
+        # Several fields showing the same value: computed once
+        text_rows.extend((_ALIAS, None, (field, first)) for field in rest)
+    text_runs = _runs(text_rows)
+    checkbox_runs = _runs(
+        _compile_row(field, source, default, bool) for field, source, default in checkbox_plan)
+    
+    def field_plan(c, s):
+        vals = {}
+        cb = {}
+        _fill_runs(text_runs, c, s, vals)
+        _fill_runs(checkbox_runs, c, s, cb)
+        return vals, cb
+    
+    return field_plan
+
+
+_field_plan = compile_field_plan()
+
+
+def build_field_values(character, spell_limit=False):
+    """
+    Build complete dictionary mapping PDF field names to character values
+    by running the compiled field plan.
+    spell_limit=True keeps at most class level + spellcasting modifier
+    levelled spells (lowest levels first).
+    Returns (text_vals, checkbox_vals)
+    """
+    stats = _character_stats(character)
+    vals, cb = _field_plan(character, stats)
+    _spell_values(character, stats, vals, cb, spell_limit)
+    return vals, cb
+
+
+# ============================================================================
+# SPELLCASTING (PAGE 3)
+# ============================================================================
+
+# Blank spell page, applied before filling so nothing from the template shows
+_BLANK_SPELL_FIELDS = dict.fromkeys(
+    CANTRIP_FIELDS + [field for level in range(1, 10) for field in SPELL_FIELDS_BY_LEVEL.get(level, [])],
+    "",
+)
+_BLANK_PREP_CHECKBOXES = dict.fromkeys(
+    (SPELL_FIELD_TO_PREP_CHECKBOX[field] for field in _BLANK_SPELL_FIELDS
+     if field in SPELL_FIELD_TO_PREP_CHECKBOX),
+    False,
+)
+_BLANK_SPELL_SLOTS = {
+    field: ''
+    for field_idx in range(19, 28)
+    for field in (f'SlotsTotal {field_idx}', f'SlotsRemaining {field_idx}')
+}
+
+
+def _spell_values(character, stats, vals, cb, spell_limit=False):
+    # The spell page is positional (the n-th spell of a level goes in that
+    # level's n-th line), so it is one step rather than per-field rows.
     
     # First, clear ALL spell fields and prepared checkboxes
-    for field in CANTRIP_FIELDS:
-        vals[field] = ""
+    vals.update(_BLANK_SPELL_FIELDS)
+    cb.update(_BLANK_PREP_CHECKBOXES)
+    
+    spellcasting = character.get('spellcasting')
+    if not spellcasting:
+        # Non-caster: blank all spell slots
+        vals.update(_BLANK_SPELL_SLOTS)
+        return
+    
+    vals['Spellcasting Class 2'] = spellcasting.get('class', '')
+    vals['SpellcastingAbility 2'] = spellcasting.get('ability', '').upper()[:3]
+    vals['SpellSaveDC  2'] = str(spellcasting.get('spell_save_dc', ''))  # two spaces!
+    vals['SpellAtkBonus 2'] = format_modifier(spellcasting.get('spell_attack_bonus', 0))
+    
+    # Spell slots (levels 1-9 -> fields 19-27)
+    spell_slots = spellcasting.get('spell_slots', {})
+    for lv_num in range(1, 10):
+        key = f'level_{lv_num}'
+        field_idx = 18 + lv_num  # 19..27
+        if key in spell_slots:
+            vals[f'SlotsTotal {field_idx}'] = str(spell_slots[key].get('total', 0))
+            vals[f'SlotsRemaining {field_idx}'] = str(spell_slots[key].get('remaining', 0))
+        else:
+            vals[f'SlotsTotal {field_idx}'] = ''
+            vals[f'SlotsRemaining {field_idx}'] = ''
+    
+    cantrips, spells_by_level = _partition_spells(spellcasting, stats["class"]['name'])
+    if spell_limit:
+        _limit_spells(spells_by_level, character, stats)
+    
+    # Fill cantrip fields (no prepared checkboxes)
+    for field, name in zip(CANTRIP_FIELDS, cantrips):
+        vals[field] = name
+    
+    # Fill leveled spell fields + prepared checkboxes
     for level in range(1, 10):
-        for field in SPELL_FIELDS_BY_LEVEL.get(level, []):
-            vals[field] = ""
-            # Clear prepared checkbox
+        for field, spell in zip(SPELL_FIELDS_BY_LEVEL.get(level, []), spells_by_level[level]):
+            vals[field] = spell['name']
             if field in SPELL_FIELD_TO_PREP_CHECKBOX:
-                cb[SPELL_FIELD_TO_PREP_CHECKBOX[field]] = False
+                cb[SPELL_FIELD_TO_PREP_CHECKBOX[field]] = spell['prepared']
+
+
+def _partition_spells(spellcasting, class_name):
+    # Returns (cantrip names, {level: [{name, prepared}]})
+    cantrips = []
+    spells_by_level = {lv: [] for lv in range(1, 10)}
     
-    if spellcasting:
-        vals['Spellcasting Class 2'] = spellcasting.get('class', '')
-        vals['SpellcastingAbility 2'] = spellcasting.get('ability', '').upper()[:3]
-        vals['SpellSaveDC  2'] = str(spellcasting.get('spell_save_dc', ''))  # two spaces!
-        vals['SpellAtkBonus 2'] = format_modifier(spellcasting.get('spell_attack_bonus', 0))
-        
-        # Spell slots (levels 1-9 -> fields 19-27)
-        spell_slots = spellcasting.get('spell_slots', {})
-        for lv_num in range(1, 10):
-            key = f'level_{lv_num}'
-            field_idx = 18 + lv_num  # 19..27
-            if key in spell_slots:
-                vals[f'SlotsTotal {field_idx}'] = str(spell_slots[key].get('total', 0))
-                vals[f'SlotsRemaining {field_idx}'] = str(spell_slots[key].get('remaining', 0))
-            else:
-                vals[f'SlotsTotal {field_idx}'] = ''
-                vals[f'SlotsRemaining {field_idx}'] = ''
-        
-        # Partition spells by level
-        cantrips = []
-        spells_by_level = {lv: [] for lv in range(1, 10)}
-        
-        # Get cantrips from cantrips_known
-        for entry in spellcasting.get('cantrips_known', []):
-            if isinstance(entry, dict):
-                cantrips.append(entry.get('name', ''))
-            else:
-                cantrips.append(str(entry))
-        
-        # Get leveled spells from spells_known
-        # Also check for level 0 spells mixed in
-        is_known_caster = class_name.lower() in KNOWN_SPELLS_CASTERS
-        
-        for spell in spellcasting.get('spells_known', []):
-            lvl = spell.get('level', 0)
-            name = spell.get('name', '')
-            prepared = spell.get('prepared', False)
-            
-            if lvl == 0:
-                if name not in cantrips:
-                    cantrips.append(name)
-            else:
-                # For known-spells casters, treat all known spells as prepared
-                if is_known_caster:
-                    prepared = True
-                spells_by_level[lvl].append({
-                    'name': name,
-                    'prepared': prepared
-                })
+    # Get cantrips from cantrips_known
+    for entry in spellcasting.get('cantrips_known', []):
+        if isinstance(entry, dict):
+            cantrips.append(entry.get('name', ''))
+        else:
+            cantrips.append(str(entry))
+    
+    # Get leveled spells from spells_known
+    # Also check for level 0 spells mixed in
+    is_known_caster = class_name.lower() in KNOWN_SPELLS_CASTERS
+    
+    for spell in spellcasting.get('spells_known', []):
+        lvl = spell.get('level', 0)
+        name = spell.get('name', '')
+        prepared = spell.get('prepared', False)
         
-        # Fill cantrip fields (no prepared checkboxes)
-        for i, field in enumerate(CANTRIP_FIELDS):
-            if i < len(cantrips):
-                vals[field] = cantrips[i]
+        if lvl == 0:
+            if name not in cantrips:
+                cantrips.append(name)
+        else:
+            # For known-spells casters, treat all known spells as prepared
+            if is_known_caster:
+                prepared = True
+            spells_by_level[lvl].append({
+                'name': name,
+                'prepared': prepared
+            })
+    return cantrips, spells_by_level
+
+
+def _limit_spells(spells_by_level, character, stats):
+    """Truncate levelled spells to character level + casting modifier."""
+    ability_key = CASTING_ABILITY.get(stats["class"]['name'].lower())
+    if ability_key is None:
+        ability_key = character.get('spellcasting', {}).get('ability', '').lower()[:3]
+    casting_mod = ability_mod(character['ability_scores'].get(ability_key, 10))
+    
+    budget = max(1, stats["level"] + casting_mod)
+    for lv in range(1, 10):
+        if budget <= 0:
+            spells_by_level[lv] = []
+        elif len(spells_by_level[lv]) > budget:
+            spells_by_level[lv] = spells_by_level[lv][:budget]
+            budget = 0
+        else:
+            budget -= len(spells_by_level[lv])
+
+
+# ============================================================================
+# PDF TEMPLATE
+# ============================================================================
+
+TEMPLATE_PATH = Path(__file__).parent / "assets" / "5E_CharacterSheet_Fillable.pdf"
+
+_template_lock = threading.Lock()
+_template_bytes = None
+_template_writers = {}  # resolved pdf path -> parsed, never-filled PdfWriter
+_field_indexes = {}     # resolved pdf path -> field_index()
+
+
+def load_template():
+    """Read the blank character sheet once per process and return its bytes."""
+    global _template_bytes
+    if _template_bytes is None:
+        with _template_lock:
+            if _template_bytes is None:
+                _template_bytes = TEMPLATE_PATH.read_bytes()
+    return _template_bytes
+
+
+def load_template_writer(pdf_path=None):
+    """
+    Parse a blank sheet once per process and return the shared prototype
+    writer. Never fill it directly - use template_writer() for a copy.
+    """
+    key = str(Path(pdf_path or TEMPLATE_PATH).resolve())
+    writer = _template_writers.get(key)
+    if writer is None:
+        data = load_template() if key == str(TEMPLATE_PATH.resolve()) else Path(key).read_bytes()
+        with _template_lock:
+            writer = _template_writers.get(key)
+            if writer is None:
+                writer = PdfWriter()
+                writer.append_pages_from_reader(PdfReader(io.BytesIO(data)))
+                _template_writers[key] = writer
+    return writer
+
+
+def template_writer(pdf_path=None):
+    """Return a fresh PdfWriter holding a private copy of the blank sheet."""
+    return _clone_writer(load_template_writer(pdf_path))
+
+
+def template_loaded():
+    """True once the default template has been parsed."""
+    return str(TEMPLATE_PATH.resolve()) in _template_writers
+
+
+def field_index(pdf_path=None):
+    """
+    Map every field name in a blank sheet to [(page_number, idnum, is_widget)].
+    Built once per template; the object numbers are the same in every
+    template_writer() copy, so fills are direct lookups. is_widget is False
+    when the name belongs to the annotation's /Parent field.
+    """
+    key = str(Path(pdf_path or TEMPLATE_PATH).resolve())
+    index = _field_indexes.get(key)
+    if index is None:
+        writer = load_template_writer(pdf_path)
+        with _template_lock:
+            index = _field_indexes.get(key)
+            if index is None:
+                index = _build_field_index(writer)
+                _field_indexes[key] = index
+    return index
+
+
+def _build_field_index(writer):
+    index = {}
+    for page_number, page in enumerate(writer.pages):
+        if "/Annots" not in page:
+            continue
+        for annot_ref in page["/Annots"]:
+            annot = annot_ref.get_object()
+            if "/T" in annot:
+                index.setdefault(str(annot["/T"]), []).append(
+                    (page_number, annot_ref.idnum, True))
+            parent_ref = annot.get("/Parent")
+            if parent_ref is not None and "/T" in parent_ref.get_object():
+                index.setdefault(str(parent_ref.get_object()["/T"]), []).append(
+                    (page_number, parent_ref.idnum, False))
+    return index
+
+
+def _clone_writer(src):
+    # PdfWriter has no cheap copy in PyPDF2 3.x: append_pages_from_reader()
+    # and deepcopy() both go through the generic clone() machinery (~70 ms for
+    # this sheet). The prototype only holds plain dicts/arrays, streams and
+    # immutable scalars, so copy the containers, share the rest (including
+    # stream bytes), and point every indirect reference at the new writer.
+    dst = PdfWriter()
+    dst._header = src._header
+    dst._objects = [_clone_object(obj, src, dst) for obj in src._objects]
+    dst._root = IndirectObject(src._root.idnum, 0, dst)
+    dst._root_object = dst._objects[dst._root.idnum - 1]
+    dst._pages = IndirectObject(src._pages.idnum, 0, dst)
+    dst._info = IndirectObject(src._info.idnum, 0, dst)
+    dst._idnum_hash = {
+        h: IndirectObject(ref.idnum, ref.generation, dst) for h, ref in src._idnum_hash.items()
+    }
+    dst._id_translated = {k: dict(v) for k, v in src._id_translated.items()}
+    return dst
+
+
+def _clone_object(obj, src, dst, idnums=None):
+    # idnums optionally renumbers references ({old idnum: new idnum})
+    if isinstance(obj, IndirectObject):
+        idnum = obj.idnum if idnums is None else idnums.get(obj.idnum, obj.idnum)
+        return IndirectObject(idnum, obj.generation, dst)
+    if isinstance(obj, dict):
+        new = obj.__class__.__new__(obj.__class__)
+        dict.update(new, ((k, _clone_object(v, src, dst, idnums)) for k, v in obj.items()))
+    elif isinstance(obj, list):
+        new = obj.__class__.__new__(obj.__class__)
+        list.extend(new, (_clone_object(v, src, dst, idnums) for v in obj))
+    else:
+        return obj
+    for attr, value in obj.__dict__.items():
+        if isinstance(value, IndirectObject):
+            value = _clone_object(value, src, dst, idnums)
+        elif value is src:
+            value = dst
+        new.__dict__[attr] = value
+    return new
+
+
+# ============================================================================
+# INCREMENTAL OUTPUT
+# ============================================================================
+
+_incremental_templates = {}  # resolved pdf path -> load_incremental_template()
+
+
+def write_incremental(stream, text_vals, checkbox_vals, pdf_path=None):
+    """
+    Write a filled sheet as the blank template's bytes, unchanged, followed by
+    a PDF incremental-update section holding only the field objects that were
+    filled, the /AcroForm with NeedAppearances set, and a new xref stream
+    whose /Prev points at the template's own. Field values match
+    fill_text_fields() + set_checkboxes().
+    """
+    template = load_incremental_template(pdf_path)
+
+    # (idnum, generation) -> (original field dict, {key: new value})
+    changes = {}
+    for field_name, value in text_vals.items():
+        for idnum, generation, annot, is_widget in template["fields"].get(field_name, ()):
+            updates = changes.setdefault((idnum, generation), (annot, {}))[1]
+            if is_widget and annot.get("/FT") == "/Btn":
+                updates[NameObject("/AS")] = NameObject(value)
+            updates[NameObject("/V")] = TextStringObject(value)
+    for field_name, checked in checkbox_vals.items():
+        state = NameObject("/Yes") if checked else NameObject("/Off")
+        for idnum, generation, annot, is_widget in template["fields"].get(field_name, ()):
+            if is_widget:
+                updates = changes.setdefault((idnum, generation), (annot, {}))[1]
+                updates[NameObject("/V")] = state
+                updates[NameObject("/AS")] = state
+
+    data = template["data"]
+    stream.write(memoryview(data))
+    body = io.BytesIO()
+    body.write(b"\n")
+    offsets = []
+    for (idnum, generation), (annot, updates) in changes.items():
+        if _unchanged(annot, updates):
+            continue
+        obj = DictionaryObject()
+        dict.update(obj, annot)
+        dict.update(obj, updates)
+        offsets.append((idnum, generation, len(data) + body.tell()))
+        body.write(b"%d %d obj\n" % (idnum, generation))
+        obj.write_to_stream(body, None)
+        body.write(b"\nendobj\n")
+    for idnum, generation, raw in template["objects"]:
+        offsets.append((idnum, generation, len(data) + body.tell()))
+        body.write(raw)
+
+    # Cross-reference stream for the update (the template itself uses xref
+    # streams and object streams, so the update does too)
+    xref_idnum = template["size"]
+    xref_offset = len(data) + body.tell()
+    offsets.append((xref_idnum, 0, xref_offset))
+    offsets.sort()
+    index, rows = [], []
+    for idnum, generation, offset in offsets:
+        if index and index[-2] + index[-1] == idnum:
+            index[-1] += 1
+        else:
+            index += [idnum, 1]
+        rows.append(struct.pack(">BIH", 1, offset, generation))
+    xref = zlib.compress(b"".join(rows))
+    body.write(
+        b"%d 0 obj\n<< /Type /XRef /Size %d /Index [%s] /W [1 4 2] %s "
+        b"/Filter /FlateDecode /Length %d >>\nstream\n"
+        % (xref_idnum, xref_idnum + 1, " ".join(map(str, index)).encode(),
+           template["trailer"], len(xref))
+    )
+    body.write(xref)
+    body.write(b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % xref_offset)
+    stream.write(body.getbuffer())
+
+
+def _unchanged(annot, updates):
+    # Most of a sheet is blank: "" text and /Off boxes on fields that have no
+    # /V yet read the same as the template, so those objects are not rewritten.
+    for key, value in updates.items():
+        current = annot.get(key)
+        if current is None:
+            if value not in ("", "/Off"):
+                return False
+        elif current != value:
+            return False
+    return True
+
+
+def load_incremental_template(pdf_path=None):
+    """Read a blank sheet once per process for write_incremental()."""
+    key = str(Path(pdf_path or TEMPLATE_PATH).resolve())
+    template = _incremental_templates.get(key)
+    if template is None:
+        data = load_template() if key == str(TEMPLATE_PATH.resolve()) else Path(key).read_bytes()
+        with _template_lock:
+            template = _incremental_templates.get(key)
+            if template is None:
+                template = _build_incremental_template(data)
+                _incremental_templates[key] = template
+    return template
+
+
+def _build_incremental_template(data):
+    # Everything is resolved here, once, in the file's own object numbering;
+    # write_incremental() never touches the reader again.
+    reader = PdfReader(io.BytesIO(data))
+
+    fields = {}
+    for page in reader.pages:
+        if "/Annots" not in page:
+            continue
+        for annot_ref in page["/Annots"]:
+            annot = annot_ref.get_object()
+            if "/T" in annot:
+                fields.setdefault(str(annot["/T"]), []).append(
+                    (annot_ref.idnum, annot_ref.generation, annot, True))
+            parent_ref = annot.raw_get("/Parent") if "/Parent" in annot else None
+            if parent_ref is not None and "/T" in parent_ref.get_object():
+                fields.setdefault(str(parent_ref.get_object()["/T"]), []).append(
+                    (parent_ref.idnum, parent_ref.generation, parent_ref.get_object(), False))
+
+    # NeedAppearances lives on the /AcroForm dict, which is either its own
+    # object or inline in the catalog; rewrite whichever one holds it.
+    root_ref = reader.trailer.raw_get("/Root")
+    root = root_ref.get_object()
+    acroform = DictionaryObject()
+    dict.update(acroform, root["/AcroForm"])
+    acroform[NameObject("/NeedAppearances")] = BooleanObject(True)
+    acroform_ref = root.raw_get("/AcroForm")
+    if isinstance(acroform_ref, IndirectObject):
+        target_ref, target = acroform_ref, acroform
+    else:
+        target_ref, target = root_ref, DictionaryObject()
+        dict.update(target, root)
+        target[NameObject("/AcroForm")] = acroform
+    raw = io.BytesIO()
+    raw.write(b"%d %d obj\n" % (target_ref.idnum, target_ref.generation))
+    target.write_to_stream(raw, None)
+    raw.write(b"\nendobj\n")
+
+    size = max(max(by_id) for by_id in reader.xref.values() if by_id)
+    if reader.xref_objStm:
+        size = max(size, max(reader.xref_objStm))
+    size += 1
+
+    trailer = b"/Root %d %d R" % (root_ref.idnum, root_ref.generation)
+    if "/Info" in reader.trailer:
+        info_ref = reader.trailer.raw_get("/Info")
+        trailer += b" /Info %d %d R" % (info_ref.idnum, info_ref.generation)
+    if "/ID" in reader.trailer:
+        ids = [getattr(part, "original_bytes", part) for part in reader.trailer["/ID"]]
+        trailer += b" /ID [<%s> <%s>]" % (ids[0].hex().encode(), ids[1].hex().encode())
+    startxref = data.rindex(b"startxref")
+    trailer += b" /Prev %d" % int(data[startxref + len(b"startxref"):].split()[0])
+
+    return {
+        "data": data,
+        "fields": fields,
+        "objects": [(target_ref.idnum, target_ref.generation, raw.getvalue())],
+        "size": size,
+        "trailer": trailer,
+    }
+
+
+# ============================================================================
+# FLATTEN
+# ============================================================================
+
+# Helvetica advance widths (1/1000 em) for WinAnsi codes 32-126. Only /Helv
+# is used for text on this sheet; other standard fonts are approximated.
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_WINANSI_EXTRA_WIDTHS = {0x85: 1000, 0x91: 222, 0x92: 222, 0x93: 333, 0x94: 333,
+                         0x95: 350, 0x96: 556, 0x97: 1000}
+_STANDARD_FONTS = {"/Helv": "/Helvetica", "/HeBo": "/Helvetica-Bold",
+                   "/TiRo": "/Times-Roman", "/Cour": "/Courier", "/ZaDb": "/ZapfDingbats"}
+_ASCENT, _DESCENT = 0.718, 0.207  # Helvetica, as a fraction of the font size
+_PADDING = 2
+_MIN_FONT_SIZE = 4
+_MAX_AUTO_FONT_SIZE = 12
+
+_form_defaults_cache = {}  # resolved pdf path -> _form_defaults()
+
+
+def flatten_form(writer, pdf_path=None):
+    """
+    Bake the filled values into the page content and drop the form, for
+    read-only sheets that render fast. Text fields get a generated
+    appearance, checked boxes draw their own /Yes appearance, widget
+    annotations and the /AcroForm are removed, and objects nothing refers to
+    any more are emptied so they don't bloat the output.
+    writer must come from template_writer(pdf_path) and already be filled.
+    """
+    defaults = _form_defaults(pdf_path)
+    fonts = {}  # DA font name -> font object added to this writer
+
+    for page in writer.pages:
+        if "/Annots" not in page:
+            continue
+        resources = page["/Resources"]
+        ops = []
+        kept = ArrayObject()
+        for annot_ref in page["/Annots"]:
+            annot = annot_ref.get_object()
+            if annot.get("/Subtype") != "/Widget":
+                kept.append(annot_ref)
+                continue
+            if int(annot.get("/F", 0)) & 2:  # hidden
+                continue
+            field_type = _inherited(annot, "/FT")
+            if field_type == "/Tx":
+                value = _inherited(annot, "/V")
+                if value:
+                    ops.append(_text_field_ops(writer, annot, str(value), defaults,
+                                               resources, fonts))
+            elif field_type == "/Btn" and "/AP" in annot:
+                ops.append(_appearance_ops(writer, annot, resources))
+
+        if kept:
+            page[NameObject("/Annots")] = kept
+        else:
+            del page["/Annots"]
+        ops = [op for op in ops if op]
+        if ops:
+            _append_content(writer, page, b"".join(ops))
+
+    root = writer._root_object
+    if "/AcroForm" in root:
+        # PyPDF2's set_need_appearances_writer() points /AcroForm at whatever
+        # object happens to be last; undo the flag it left there.
+        acroform = root["/AcroForm"]
+        if isinstance(acroform, DictionaryObject) and "/Fields" not in acroform:
+            acroform.pop(NameObject("/NeedAppearances"), None)
+        del root["/AcroForm"]
+    _drop_unreachable(writer)
+
+
+def _inherited(annot, key):
+    # Field attributes can live on the widget or on any /Parent field
+    node = annot
+    while node is not None:
+        if key in node:
+            return node[key]
+        node = node.get("/Parent")
+        node = node.get_object() if node is not None else None
+    return None
+
+
+def _form_defaults(pdf_path=None):
+    # The prototype writer doesn't carry the template's /AcroForm, so read
+    # the form-wide /DA, /Q and font names from the file once per template.
+    key = str(Path(pdf_path or TEMPLATE_PATH).resolve())
+    defaults = _form_defaults_cache.get(key)
+    if defaults is None:
+        data = load_template() if key == str(TEMPLATE_PATH.resolve()) else Path(key).read_bytes()
+        acroform = PdfReader(io.BytesIO(data)).trailer["/Root"].get("/AcroForm")
+        acroform = acroform.get_object() if acroform is not None else {}
+        base_fonts = dict(_STANDARD_FONTS)
+        resources = acroform.get("/DR")
+        if resources is not None and "/Font" in resources.get_object():
+            for name, font in resources.get_object()["/Font"].items():
+                base_font = font.get_object().get("/BaseFont")
+                if base_font is not None:
+                    base_fonts[name] = str(base_font)
+        defaults = {
+            "da": str(acroform.get("/DA", "/Helv 0 Tf 0 g")),
+            "q": int(acroform.get("/Q", 0)),
+            "base_fonts": base_fonts,
+        }
+        with _template_lock:
+            _form_defaults_cache.setdefault(key, defaults)
+    return defaults
+
+
+def preload_template(pdf_path=None, incremental=False):
+    """
+    Parse everything a render needs from the template up front (writer,
+    field index, flatten defaults and, with incremental=True, the
+    incremental-update template), so the first sheet is as fast as the rest.
+    """
+    load_template_writer(pdf_path)
+    field_index(pdf_path)
+    _form_defaults(pdf_path)
+    if incremental:
+        load_incremental_template(pdf_path)
+
+
+def _text_field_ops(writer, annot, value, defaults, resources, fonts):
+    x1, y1, x2, y2 = _rect(annot)
+    width, height = x2 - x1, y2 - y1
+    font_name, font_size, color = _parse_da(str(_inherited(annot, "/DA") or defaults["da"]))
+    resource_name = _page_font(writer, resources, fonts, font_name, defaults)
+    quadding = int(_inherited(annot, "/Q") or defaults["q"])
+    multiline = int(_inherited(annot, "/Ff") or 0) & 4096
+    inner = width - 2 * _PADDING
+
+    if multiline:
+        size = font_size or _MAX_AUTO_FONT_SIZE
+        lines = _wrap(value, inner, size)
+        while not font_size and size > _MIN_FONT_SIZE and len(lines) * size * 1.15 > height - 2 * _PADDING:
+            size -= 0.5
+            lines = _wrap(value, inner, size)
+        y = height - _PADDING - size * _ASCENT
+    else:
+        size = font_size or min(_MAX_AUTO_FONT_SIZE, (height - 2) / (_ASCENT + _DESCENT))
+        text_width = _text_width(value, 1)
+        if not font_size and text_width * size > inner:
+            size = max(_MIN_FONT_SIZE, inner / text_width)
+        lines = [value.replace("\r", " ").replace("\n", " ")]
+        y = (height - size * (_ASCENT + _DESCENT)) / 2 + size * _DESCENT
+
+    out = [b"q 1 0 0 1 %.3f %.3f cm 0 0 %.3f %.3f re W n BT %s %.2f Tf %s"
+           % (x1, y1, width, height, resource_name.encode(), size, color.encode())]
+    for line in lines:
+        line_width = _text_width(line, size)
+        if quadding == 1:
+            x = (width - line_width) / 2
+        elif quadding == 2:
+            x = width - _PADDING - line_width
+        else:
+            x = _PADDING
+        out.append(b" 1 0 0 1 %.3f %.3f Tm (%s) Tj" % (x, y, _pdf_string(line)))
+        y -= size * 1.15
+    out.append(b" ET Q\n")
+    return b"".join(out)
+
+
+def _appearance_ops(writer, annot, resources):
+    # Draw the widget's current normal appearance (e.g. /Yes for a checked box)
+    normal = annot["/AP"].get("/N")
+    if normal is None:
+        return b""
+    normal = normal.get_object()
+    if "/BBox" not in normal:  # a state dictionary, not a stream
+        state = annot.get("/AS")
+        if state is None or state not in normal:
+            return b""
+        stream_ref = normal.raw_get(state)
+    else:
+        stream_ref = annot["/AP"].raw_get("/N")
+    if not isinstance(stream_ref, IndirectObject):
+        stream_ref = writer._add_object(stream_ref)
+    stream = stream_ref.get_object()
+
+    # Map the transformed /BBox onto /Rect (PDF 32000 12.5.5)
+    bx1, by1, bx2, by2 = (float(v) for v in stream["/BBox"])
+    a, b, c, d, e, f = (float(v) for v in stream.get("/Matrix", [1, 0, 0, 1, 0, 0]))
+    corners = [(a * x + c * y + e, b * x + d * y + f) for x in (bx1, bx2) for y in (by1, by2)]
+    left, right = min(p[0] for p in corners), max(p[0] for p in corners)
+    bottom, top = min(p[1] for p in corners), max(p[1] for p in corners)
+    if right <= left or top <= bottom:
+        return b""
+    x1, y1, x2, y2 = _rect(annot)
+    sx, sy = (x2 - x1) / (right - left), (y2 - y1) / (top - bottom)
+
+    name = "/FlatAp%d" % stream_ref.idnum
+    xobjects = _resource_dict(resources, "/XObject")
+    xobjects[NameObject(name)] = stream_ref
+    return b"q %.4f 0 0 %.4f %.3f %.3f cm %s Do Q\n" % (
+        sx, sy, x1 - left * sx, y1 - bottom * sy, name.encode())
+
+
+def _rect(annot):
+    x1, y1, x2, y2 = (float(v) for v in annot["/Rect"])
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def _parse_da(da):
+    """Split a /DA string into (font name, size, remaining colour operators)."""
+    tokens = da.split()
+    font_name, font_size, rest = "/Helv", 0.0, []
+    i = 0
+    while i < len(tokens):
+        if i + 2 < len(tokens) and tokens[i + 2] == "Tf":
+            font_name, font_size = tokens[i], float(tokens[i + 1])
+            i += 3
+        else:
+            rest.append(tokens[i])
+            i += 1
+    return font_name, font_size, " ".join(rest) or "0 g"
+
+
+def _page_font(writer, resources, fonts, font_name, defaults):
+    """Add a standard Type1 font for font_name to the page; return its resource name."""
+    font_ref = fonts.get(font_name)
+    if font_ref is None:
+        font = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject(defaults["base_fonts"].get(font_name, "/Helvetica")),
+        })
+        if font_name not in ("/ZaDb", "/Symb"):
+            font[NameObject("/Encoding")] = NameObject("/WinAnsiEncoding")
+        font_ref = fonts[font_name] = writer._add_object(font)
+    page_fonts = _resource_dict(resources, "/Font")
+    name = font_name
+    while name in page_fonts and page_fonts.raw_get(name) != font_ref:
+        name += "_"
+    page_fonts[NameObject(name)] = font_ref
+    return name
+
+
+def _resource_dict(resources, key):
+    if key not in resources:
+        resources[NameObject(key)] = DictionaryObject()
+    return resources[key]
+
+
+def _text_width(text, size):
+    total = 0
+    for code in text.encode("cp1252", "replace"):
+        if 32 <= code <= 126:
+            total += _HELVETICA_WIDTHS[code - 32]
+        else:
+            total += _WINANSI_EXTRA_WIDTHS.get(code, 556)
+    return total * size / 1000
+
+
+def _wrap(text, width, size):
+    lines = []
+    for paragraph in text.replace("\r\n", "\n").split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if _text_width(candidate, size) <= width or not line:
+                line = candidate
             else:
-                vals[field] = ""
-        
-        # Fill leveled spell fields + prepared checkboxes
-        for level in range(1, 10):
-            fields = SPELL_FIELDS_BY_LEVEL.get(level, [])
-            spells = spells_by_level[level]
-            
-            for i, field in enumerate(fields):
-                if i < len(spells):
-                    spell = spells[i]
-                    vals[field] = spell['name']
-                    # Set prepared checkbox
-                    if field in SPELL_FIELD_TO_PREP_CHECKBOX:
-                        cb[SPELL_FIELD_TO_PREP_CHECKBOX[field]] = spell['prepared']
-                else:
-                    vals[field] = ""
-                    if field in SPELL_FIELD_TO_PREP_CHECKBOX:
-                        cb[SPELL_FIELD_TO_PREP_CHECKBOX[field]] = False
+                lines.append(line)
+                line = word
+            # A single word wider than the box is broken by characters
+            while _text_width(line, size) > width and len(line) > 1:
+                cut = len(line) - 1
+                while cut > 1 and _text_width(line[:cut], size) > width:
+                    cut -= 1
+                lines.append(line[:cut])
+                line = line[cut:]
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text):
+    data = text.encode("cp1252", "replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _append_content(writer, page, data):
+    # Wrap the existing content in q/Q so our drawing starts from a clean
+    # graphics state, then add the field drawing after it.
+    contents = page.raw_get("/Contents")
+    if isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+        contents = contents.get_object()
+    parts = list(contents) if isinstance(contents, ArrayObject) else [contents]
+    streams = []
+    for stream_data in (b"q\n", b"Q\n" + data):
+        stream = DecodedStreamObject()
+        stream.set_data(stream_data)
+        streams.append(writer._add_object(stream.flate_encode()))
+    page[NameObject("/Contents")] = ArrayObject([streams[0]] + parts + [streams[1]])
+
+
+def _drop_unreachable(writer):
+    # PdfWriter.write() emits every object it holds, referenced or not, and
+    # can't skip slots; replace the orphans (widgets, their fields and /DV
+    # strings, ...) with null so the output only carries what is drawn.
+    reachable = set()
+    stack = [writer._root, writer._info]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in reachable:
+                continue
+            reachable.add(obj.idnum)
+            stack.append(writer._objects[obj.idnum - 1])
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    for i in range(len(writer._objects)):
+        if i + 1 not in reachable:
+            writer._objects[i] = NullObject()
+
+
+# ============================================================================
+# PARTY PDF
+# ============================================================================
+
+class _SheetPickler(pickle.Pickler):
+    # References to the sheet's writer are saved as a placeholder...
+    def __init__(self, file, writer):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.writer = writer
+    
+    def persistent_id(self, obj):
+        return "writer" if obj is self.writer else None
+
+
+class _SheetUnpickler(pickle.Unpickler):
+    # ...and point at the writer the objects are loaded into
+    def __init__(self, file, writer):
+        super().__init__(file)
+        self.writer = writer
+    
+    def persistent_load(self, pid):
+        return self.writer
+
+
+def sheet_delta(writer, pdf_path=None):
+    """
+    The objects of a filled template_writer(pdf_path) copy that differ from
+    the blank template (plus any it appended), pickled: tens of KB instead of
+    the whole sheet. sheet_writer() turns it back into a writer for
+    merge_sheets(), so worker processes can fill the party's sheets.
+    """
+    base = load_template_writer(pdf_path)._objects
+    changed = {
+        idnum: obj for idnum, obj in enumerate(writer._objects, 1)
+        if idnum > len(base) or not _same_object(obj, base[idnum - 1])
+    }
+    out = io.BytesIO()
+    _SheetPickler(out, writer).dump(changed)
+    return out.getvalue()
+
+
+def sheet_writer(delta, pdf_path=None, shared=False):
+    """
+    Writer for a sheet_delta(): a template_writer() copy with the changed
+    objects put back. shared=True skips the copy and shares the blank
+    template's objects instead; such a writer must only be read, which is
+    all merge_sheets() does with writers[1:].
+    """
+    if shared:
+        src = load_template_writer(pdf_path)
+        writer = PdfWriter()
+        writer._header = src._header
+        writer._objects = list(src._objects)
+        writer._root = IndirectObject(src._root.idnum, 0, writer)
+        writer._root_object = writer._objects[writer._root.idnum - 1]
+        writer._pages = IndirectObject(src._pages.idnum, 0, writer)
     else:
-        # Non-caster: blank all spell slots
-        for lv_num in range(1, 10):
-            field_idx = 18 + lv_num
-            vals[f'SlotsTotal {field_idx}'] = ''
-            vals[f'SlotsRemaining {field_idx}'] = ''
+        writer = template_writer(pdf_path)
+    changed = _SheetUnpickler(io.BytesIO(delta), writer).load()
+    for idnum in sorted(changed):  # appended objects come in order
+        if idnum > len(writer._objects):
+            writer._objects.append(changed[idnum])
+        else:
+            writer._objects[idnum - 1] = changed[idnum]
+    writer._root_object = writer._objects[writer._root.idnum - 1]
+    return writer
+
+
+def merge_sheets(writers, labels, pdf_path=None):
+    """
+    Append the pages of writers[1:] to writers[0] and return it as one
+    "party" PDF. writers must be template_writer(pdf_path) copies filled the
+    same way (both fillable or both flattened). Every sheet is a copy of one
+    prototype, so objects a sheet has in common with the first (fonts, page
+    content, appearance streams, ...) are referenced, not copied: each extra
+    sheet only adds its pages, widgets and whatever else differs.
+    Each sheet's fields are grouped under a parent field named by its label,
+    so same-named fields of different characters stay independent.
+    """
+    party = writers[0]
+    base_size = len(party._objects)
+    kids = party._objects[party._pages.idnum - 1]["/Kids"]
+    sheet_pages = [list(kids)]
+    for writer in writers[1:]:
+        pages = writer._objects[writer._pages.idnum - 1]["/Kids"]
+        copied = _sheet_objects(writer, pages, party, base_size)
+        idnums = {}
+        for idnum in sorted(copied):
+            party._objects.append(NullObject())
+            idnums[idnum] = len(party._objects)
+        for idnum, new_idnum in idnums.items():
+            party._objects[new_idnum - 1] = _clone_object(
+                writer._objects[idnum - 1], writer, party, idnums)
+        new_pages = [IndirectObject(idnums.get(ref.idnum, ref.idnum), 0, party) for ref in pages]
+        kids.extend(new_pages)
+        sheet_pages.append(new_pages)
+    party._objects[party._pages.idnum - 1][NameObject("/Count")] = NumberObject(len(kids))
     
-    return vals, cb
+    fields = ArrayObject()
+    for label, pages in zip(labels, sheet_pages):
+        field_kids = ArrayObject()
+        field = DictionaryObject({
+            NameObject("/T"): TextStringObject(label),
+            NameObject("/Kids"): field_kids,
+        })
+        field_ref = party._add_object(field)
+        seen = set()
+        for page_ref in pages:
+            page = page_ref.get_object()
+            for annot_ref in (page["/Annots"] if "/Annots" in page else ()):
+                # Hang the annotation's top-level field under the sheet's field
+                top_ref = annot_ref
+                while top_ref.idnum not in seen and "/Parent" in top_ref.get_object():
+                    top_ref = dict.get(top_ref.get_object(), "/Parent")
+                top = top_ref.get_object()
+                if top_ref.idnum not in seen and "/T" in top:
+                    seen.add(top_ref.idnum)
+                    top[NameObject("/Parent")] = field_ref
+                    field_kids.append(top_ref)
+        if field_kids:
+            fields.append(field_ref)
+    if fields:
+        party._root_object[NameObject("/AcroForm")] = DictionaryObject({
+            NameObject("/Fields"): fields,
+            NameObject("/NeedAppearances"): BooleanObject(True),
+            NameObject("/DA"): TextStringObject(_form_defaults(pdf_path)["da"]),
+        })
+    return party
+
+
+def _sheet_objects(writer, pages, party, base_size):
+    # Object numbers (below base_size) mean the same thing in every sheet.
+    # Walk what the sheet's pages use; an object is copied if it differs
+    # from the party's object of that number or refers to one that is copied.
+    # Pages are always copied (a page can only appear once in the tree); the
+    # catalog and page tree stay the party's.
+    shared_roots = {writer._root.idnum, writer._pages.idnum}
+    refs = {}
+    stack = [ref.idnum for ref in pages]
+    while stack:
+        idnum = stack.pop()
+        if idnum in refs or idnum in shared_roots:
+            continue
+        refs[idnum] = found = _references(writer._objects[idnum - 1])
+        stack.extend(found)
+    copied = {ref.idnum for ref in pages}
+    copied.update(
+        idnum for idnum in refs
+        if idnum > base_size or not _same_object(writer._objects[idnum - 1],
+                                                 party._objects[idnum - 1])
+    )
+    referrers = {}
+    for idnum, found in refs.items():
+        for target in found:
+            referrers.setdefault(target, []).append(idnum)
+    stack = list(copied)
+    while stack:
+        for idnum in referrers.get(stack.pop(), ()):
+            if idnum not in copied:
+                copied.add(idnum)
+                stack.append(idnum)
+    return copied
+
+
+def _references(obj):
+    found = set()
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            found.add(obj.idnum)
+        elif isinstance(obj, dict):
+            stack.extend(dict.values(obj))
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    return found
+
+
+def _same_object(a, b):
+    # Structural equality where references compare by object number
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, IndirectObject):
+        return a.idnum == b.idnum
+    if isinstance(a, StreamObject) and a._data != b._data:
+        return False
+    if isinstance(a, dict):
+        return (len(a) == len(b)
+                and all(k in b and _same_object(v, dict.__getitem__(b, k))
+                        for k, v in dict.items(a)))
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same_object(x, y) for x, y in zip(a, b))
+    return a == b
 
 
 # ============================================================================
 # OUTPUT DIRECTORY MANAGEMENT
 # ============================================================================
 
+def _umask():
+    mask = os.umask(0)  # the umask can only be read by setting it
+    os.umask(mask)
+    return mask
+
+
+# Permissions open() gives a new file. Files written through mkstemp() (0600)
+# and renamed into place are chmod'ed to this, so they look like any other
+# output. Read once at import: changing the umask isn't thread-safe.
+NEW_FILE_MODE = 0o666 & ~_umask()
+
+
 def clean_output_dir(out_folder):
     """Delete all old generated PDFs in the output folder"""
     out_path = Path(out_folder)
@@ -771,18 +1748,233 @@ def clean_output_dir(out_folder):
     out_path.mkdir(parents=True, exist_ok=True)
 
 
+# ============================================================================
+# SHEET CACHE
+# ============================================================================
+#
+# Rendering is deterministic: the same character, template and generator
+# code always give the same bytes. sheet_key() hashes those three together
+# (the character as canonical JSON, so key order and whitespace don't
+# matter), and render_character_sheet() returns a SheetCache hit instead of
+# running PyPDF2 again.
+
+# Version of the JSON -> PDF mapping and writers: any edit to this module
+# (field plan, spell layout, fill/flatten/incremental code) changes it
+MAPPING_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+_template_versions = {}  # resolved pdf path -> sha256 of the template bytes
+
+
+def template_version(pdf_path=None):
+    """SHA-256 of a blank sheet's bytes, computed once per template."""
+    key = str(Path(pdf_path or TEMPLATE_PATH).resolve())
+    version = _template_versions.get(key)
+    if version is None:
+        data = load_template() if key == str(TEMPLATE_PATH.resolve()) else Path(key).read_bytes()
+        version = _template_versions[key] = hashlib.sha256(data).hexdigest()[:16]
+    return version
+
+
+def sheet_key(character, incremental=False, flatten=False, pdf_path=None):
+    """Hash identifying the rendered PDF of a character in an output mode."""
+    canonical = json.dumps(character, sort_keys=True, separators=(",", ":"),
+                           ensure_ascii=False)
+    mode = "incremental" if incremental else "flatten" if flatten else "rewrite"
+    h = hashlib.sha256()
+    for part in (MAPPING_VERSION, template_version(pdf_path), mode, canonical):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class SheetCache:
+    """
+    Thread-safe LRU of rendered PDFs keyed by sheet_key().
+
+    max_items: sheets kept (0 disables the cache)
+    max_bytes: total PDF bytes kept; least recently used sheets go first
+    """
+    
+    def __init__(self, max_items=64, max_bytes=64 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0  # render time the hits would have cost
+        self._bytes = 0
+        self._entries = OrderedDict()  # key -> (pdf, render seconds)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Cached PDF bytes for key, or None (counted as a miss)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[0]
+    
+    def put(self, key, pdf, seconds=0.0):
+        """Keep pdf for key; seconds is what rendering it took."""
+        if not self.max_items or len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (pdf, seconds)
+            self._bytes += len(pdf)
+            while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+                _key, (evicted, _seconds) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._entries),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+# Shared by render_character_sheet() callers in this process
+sheet_cache = SheetCache()
+
+
+# ============================================================================
+# STAGE TIMING
+# ============================================================================
+
+# Called as stage_observer(stage, seconds) after each stage of a render
+# ("build_field_values", "fill", "write") when set; the web app points it at
+# its latency histograms.
+stage_observer = None
+
+
+def _stage_done(stage, started):
+    # Report a stage that began at started; returns the time it ended
+    now = time.perf_counter()
+    if stage_observer is not None:
+        stage_observer(stage, now - started)
+    return now
+
+
 # ============================================================================
 # MAIN CLI FUNCTION
 # ============================================================================
 
-def generate_character_sheet(character_json_path, output_folder="generated_character_sheets"):
+def sheet_filename(character):
+    """File name a character's sheet is saved under, e.g. Thorin_Level3.pdf."""
+    char_name = character['name'].replace(" ", "")
+    level = character['classes'][0]['level']
+    return f"{char_name}_Level{level}.pdf"
+
+
+def render_character_sheet(character, stream=None, incremental=False, flatten=False,
+                           pdf_path=None, cache=sheet_cache):
+    """
+    Fill the sheet for a character dict entirely in memory.
+    Writes the PDF into stream (any binary file-like object) if one is
+    given and returns None, otherwise returns the PDF as bytes. incremental
+    and flatten work as in generate_character_sheet().
+    An identical sheet already in cache (a SheetCache, None to always
+    render) is returned without rendering; new sheets are added to it.
+    """
+    if incremental and flatten:
+        raise ValueError("incremental and flatten output can't be combined")
+    
+    key = None
+    if cache is not None and cache.max_items:
+        key = sheet_key(character, incremental, flatten, pdf_path)
+        pdf = cache.get(key)
+        if pdf is not None:
+            if stream is None:
+                return pdf
+            stream.write(pdf)
+            return None
+    
+    started = time.perf_counter()
+    text_vals, checkbox_vals = build_field_values(character)
+    _stage_done("build_field_values", started)
+    if key is None and stream is not None:
+        _write_sheet(stream, text_vals, checkbox_vals, incremental, flatten, pdf_path)
+        return None
+    out = io.BytesIO()
+    _write_sheet(out, text_vals, checkbox_vals, incremental, flatten, pdf_path)
+    pdf = out.getvalue()
+    if key is not None:
+        cache.put(key, pdf, time.perf_counter() - started)
+    if stream is None:
+        return pdf
+    stream.write(pdf)
+    return None
+
+
+def _write_sheet(stream, text_vals, checkbox_vals, incremental, flatten, pdf_path=None):
+    started = time.perf_counter()
+    if incremental:
+        # Append only the filled fields to the unchanged template bytes
+        write_incremental(stream, text_vals, checkbox_vals, pdf_path)
+        _stage_done("write", started)
+        return
+    
+    writer = _filled_writer(text_vals, checkbox_vals, flatten, pdf_path)
+    started = _stage_done("fill", started)
+    writer.write(stream)
+    _stage_done("write", started)
+
+
+def _filled_writer(text_vals, checkbox_vals, flatten=False, pdf_path=None):
+    # A template_writer() copy with the values filled in (or drawn, flatten=True)
+    writer = template_writer(pdf_path)
+    fill_text_fields(writer, text_vals, pdf_path)
+    set_checkboxes(writer, checkbox_vals, pdf_path)
+    if flatten:
+        # Draw the values into the pages and drop the form
+        flatten_form(writer, pdf_path)
+    elif "/AcroForm" in writer._root_object:
+        # Ensure fields are visible (NeedAppearances)
+        writer._root_object["/AcroForm"].update(
+            {NameObject("/NeedAppearances"): BooleanObject(True)}
+        )
+    return writer
+
+
+def generate_character_sheet(character_json_path, output_folder="generated_character_sheets",
+                             incremental=False, flatten=False):
     """
     Main function to generate and fill a character sheet PDF.
+    With incremental=True the output is the template's bytes plus an
+    incremental update (see write_incremental()) instead of a full rewrite.
+    With flatten=True the values are drawn into the pages and the form is
+    removed (see flatten_form()); the two options are exclusive.
+    Callers that already hold the character dict should use
+    render_character_sheet() and skip the files.
     
     Usage:
         python generate_character.py --character path/to/character.json
     """
     
+    if incremental and flatten:
+        raise ValueError("incremental and flatten output can't be combined")
+    
     # Load character
     print(f"Loading character from {character_json_path}...")
     with open(character_json_path, 'r', encoding='utf-8') as f:
@@ -793,43 +1985,20 @@ def generate_character_sheet(character_json_path, output_folder="generated_chara
     clean_output_dir(output_folder)
     
     # Generate output filename
-    char_name = character['name'].replace(" ", "")
     level = character['classes'][0]['level']
-    output_filename = f"{char_name}_Level{level}.pdf"
-    output_file = Path(output_folder) / output_filename
-    
-    # Load PDF template
-    script_dir = Path(__file__).parent
-    pdf_template = script_dir / "assets" / "5E_CharacterSheet_Fillable.pdf"
-    print(f"Loading PDF template from {pdf_template}...")
-    reader = PdfReader(str(pdf_template))
-    writer = PdfWriter()
-    writer.append_pages_from_reader(reader)
+    output_file = Path(output_folder) / sheet_filename(character)
     
     # Build field values
     print("Calculating D&D 5e stats and building field mappings...")
     text_vals, checkbox_vals = build_field_values(character)
-    
-    # Fill text fields
-    print(f"Filling {len(text_vals)} text fields...")
-    for page in writer.pages:
-        writer.update_page_form_field_values(page, text_vals)
-    
-    # Fill checkboxes
     checked_count = sum(1 for v in checkbox_vals.values() if v)
-    print(f"Setting {checked_count} checkboxes (of {len(checkbox_vals)} total)...")
-    set_checkboxes(writer, checkbox_vals)
     
-    # Ensure fields are visible (NeedAppearances)
-    if "/AcroForm" in writer._root_object:
-        writer._root_object["/AcroForm"].update(
-            {NameObject("/NeedAppearances"): BooleanObject(True)}
-        )
-    
-    # Write output
-    print(f"Writing filled PDF to {output_file}...")
+    # Fill and write
+    mode = "incremental update" if incremental else "flattened sheet" if flatten else "PDF"
+    print(f"Writing {len(text_vals)} text fields and {checked_count} checkboxes "
+          f"(of {len(checkbox_vals)}) as a {mode} to {output_file}...")
     with open(output_file, "wb") as f:
-        writer.write(f)
+        _write_sheet(f, text_vals, checkbox_vals, incremental, flatten)
     
     print()
     print("=" * 60)
@@ -845,6 +2014,165 @@ def generate_character_sheet(character_json_path, output_folder="generated_chara
     return str(output_file)
 
 
+def character_paths(spec):
+    """Character JSON files given a folder (every *.json in it) or a glob."""
+    if Path(spec).is_dir():
+        paths = sorted(Path(spec).glob("*.json"))
+    else:
+        paths = sorted(Path(p) for p in glob.glob(spec))
+    if not paths:
+        raise FileNotFoundError(f"No character JSON files match {spec}")
+    return paths
+
+
+def _render_file(character, output_file, incremental, flatten, party=False):
+    # Runs in a worker process; the parent already deduplicated the batch.
+    # With party=True the filled sheet also comes back as a sheet_delta(),
+    # so the parent only has to merge the party PDF, not fill it again.
+    started = time.perf_counter()
+    text_vals, checkbox_vals = build_field_values(character)
+    delta = None
+    with open(output_file, "wb") as f:
+        if party and not incremental:
+            writer = _filled_writer(text_vals, checkbox_vals, flatten)
+            delta = sheet_delta(writer)  # before write() touches the objects
+            writer.write(f)
+        else:
+            _write_sheet(f, text_vals, checkbox_vals, incremental, flatten)
+    if party and delta is None:
+        # The party PDF is a full rewrite even when the sheets are incremental
+        delta = sheet_delta(_filled_writer(text_vals, checkbox_vals))
+    return time.perf_counter() - started, delta
+
+
+def generate_character_sheets(json_paths, output_folder="generated_character_sheets",
+                              workers=None, party_file=None, incremental=False, flatten=False):
+    """
+    Render many character JSON files in parallel, one PDF each. Unlike
+    generate_character_sheet() the output folder is not cleaned, and two
+    characters with the same name and level get numbered file names.
+    Identical characters (same sheet_key()) are rendered once and copied.
+    With party_file (relative to output_folder), every sheet is also merged
+    into one PDF that shares the template objects (see merge_sheets()); it
+    is always a full rewrite, fillable or flattened like the sheets. The
+    workers fill the party's sheets too and send them back as
+    sheet_delta()s, so this process only merges and writes the party PDF.
+    Characters that failed to render are left out of it.
+    Prints a timing summary and returns the paths written.
+    
+    Usage:
+        python generate_character.py --batch examples/ --party party.pdf
+    """
+    
+    if incremental and flatten:
+        raise ValueError("incremental and flatten output can't be combined")
+    
+    started = time.perf_counter()
+    out_path = Path(output_folder)
+    out_path.mkdir(parents=True, exist_ok=True)
+    
+    # Load every character and give each its own output file
+    jobs = []
+    taken = set()
+    for json_path in json_paths:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            character = json.load(f)
+        stem = Path(sheet_filename(character)).stem
+        name, n = stem, 1
+        while name in taken:
+            n += 1
+            name = f"{stem}_{n}"
+        taken.add(name)
+        jobs.append((character, out_path / f"{name}.pdf"))
+    
+    # Render each distinct sheet once; repeats are copied from the first
+    renders_of = {}  # sheet_key() -> index of the job that renders it
+    sources = []
+    for i, (character, _output_file) in enumerate(jobs):
+        sources.append(renders_of.setdefault(sheet_key(character, incremental, flatten), i))
+    unique = len(renders_of)
+    
+    workers = min(workers or os.cpu_count() or 1, unique)
+    print(f"Rendering {unique} distinct of {len(jobs)} character sheets "
+          f"with {workers} workers...")
+    results = {}
+    deltas = {}  # job index -> sheet_delta() of the sheets it renders
+    copied = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=preload_template,
+                             initargs=(None, incremental)) as pool:
+        futures = {i: pool.submit(_render_file, character, output_file, incremental, flatten,
+                                  bool(party_file))
+                   for i, (character, output_file) in enumerate(jobs) if sources[i] == i}
+        
+        for i, (character, output_file) in enumerate(jobs):
+            source_file = jobs[sources[i]][1]
+            if sources[i] != i:
+                if source_file in results:
+                    shutil.copyfile(source_file, output_file)
+                    results[output_file] = 0.0
+                    copied.add(output_file)
+                continue
+            try:
+                results[output_file], deltas[i] = futures[i].result()
+            except Exception as e:
+                print(f"FAILED: {character.get('name', output_file.stem)}: {e}")
+    
+    party_path = party_seconds = None
+    if party_file:
+        party_started = time.perf_counter()
+        party_jobs = [(sources[i], output_file) for i, (_c, output_file) in enumerate(jobs)
+                      if sources[i] in deltas]
+        try:
+            if not party_jobs:
+                raise ValueError("no sheet was rendered")
+            writers = [sheet_writer(deltas[source], shared=n > 0)
+                       for n, (source, _output_file) in enumerate(party_jobs)]
+            labels = [output_file.stem.replace(".", "_") for _s, output_file in party_jobs]
+            party = merge_sheets(writers, labels)
+            # Write next to the target and rename, so a failure leaves no partial file
+            fd, tmp_path = tempfile.mkstemp(dir=out_path, prefix=".party-", suffix=".pdf")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    party.write(f)
+                os.chmod(tmp_path, NEW_FILE_MODE)
+                os.replace(tmp_path, out_path / party_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            party_path = out_path / party_file
+            party_seconds = time.perf_counter() - party_started
+        except Exception as e:
+            print(f"FAILED: party PDF {party_file}: {e}")
+    
+    elapsed = time.perf_counter() - started
+    render_total = sum(results.values())
+    print()
+    print("=" * 60)
+    print(f"Rendered {len(results)} of {len(jobs)} character sheets in {elapsed:.2f}s "
+          f"({workers} workers)")
+    print("=" * 60)
+    for output_file, seconds in results.items():
+        timing = "   copy   " if output_file in copied else f"{seconds * 1000:7.0f} ms"
+        print(f"  {output_file.name:40s} {timing} "
+              f"{output_file.stat().st_size / 1024:7.0f} KB")
+    if copied:
+        print(f"Deduplicated: {len(copied)} of {len(jobs)} sheets were copies "
+              f"({len(copied) / len(jobs):.0%} hit rate)")
+    if elapsed > 0:
+        print(f"Render time summed over sheets: {render_total:.2f}s "
+              f"({render_total / elapsed:.1f}x wall clock)")
+    if party_path is not None:
+        separate = sum(output_file.stat().st_size for output_file in results)
+        print(f"Party PDF: {party_path} ({party_path.stat().st_size / 1024:.0f} KB, "
+              f"{separate / 1024:.0f} KB as separate sheets) in {party_seconds:.2f}s")
+    print("=" * 60)
+    
+    paths = [str(output_file) for output_file in results]
+    if party_path is not None:
+        paths.append(str(party_path))
+    return paths
+
+
 # ============================================================================
 # CLI INTERFACE
 # ============================================================================
@@ -853,12 +2181,35 @@ def main():
     ap = argparse.ArgumentParser(
         description='Generate D&D 5e character sheet PDFs with full field coverage'
     )
-    ap.add_argument("--character", required=True, help="Path to character JSON file")
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--character", help="Path to character JSON file")
+    source.add_argument("--batch",
+                        help="Folder or glob of character JSON files to render in parallel")
     ap.add_argument("--out-folder", default="generated_character_sheets", 
                     help="Output folder for generated PDFs")
+    ap.add_argument("--workers", type=int,
+                    help="Worker processes for --batch (default: one per CPU)")
+    ap.add_argument("--party",
+                    help="With --batch, also merge every sheet into this PDF "
+                         "(in the output folder)")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", action="store_true",
+                      help="Append the filled fields to the unchanged template bytes "
+                           "instead of rewriting the whole PDF")
+    mode.add_argument("--flatten", action="store_true",
+                      help="Draw the values into the pages and drop the form "
+                           "(read-only, smaller, renders fast)")
     args = ap.parse_args()
     
-    generate_character_sheet(args.character, args.out_folder)
+    if args.batch:
+        generate_character_sheets(character_paths(args.batch), args.out_folder,
+                                  workers=args.workers, party_file=args.party,
+                                  incremental=args.incremental, flatten=args.flatten)
+    elif args.party:
+        ap.error("--party needs --batch")
+    else:
+        generate_character_sheet(args.character, args.out_folder,
+                                 incremental=args.incremental, flatten=args.flatten)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+# indexer.py
+# Shared, incremental indexer for the D&D knowledge base.
+#
+# Every document id is derived from its content hash (and the embedding
+# model), so inserting or reordering entries in dnd_data/*.json doesn't shift
+# ids, while switching DND_EMBED_MODEL re-embeds everything. A manifest of the
+# source file hashes lets an unchanged rebuild return before the embedding
+# model or vector store is even opened.
+import hashlib
+import json
+import os
+import time
+
+import config
+from chunking import chunk_entries
+
+MANIFEST_FILE = "index_manifest.json"
+
+# Bump when the document rendering changes so every entry is re-embedded
+DOC_FORMAT = "chunks-v1"
+
+
+# ============================================================================
+# DOCUMENTS
+# ============================================================================
+
+def file_hashes(data_dir):
+    """{filename: sha256} for every JSON file in the data directory."""
+    hashes = {}
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith(".json"):
+            with open(os.path.join(data_dir, filename), "rb") as f:
+                hashes[filename] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+
+def doc_id(filename, text):
+    """Stable id for a document: source file plus a hash of its text.
+
+    The embedding model is part of the hash so vectors from a different model
+    are never reused (they may not even have the same dimension).
+    """
+    key = f"{DOC_FORMAT}\0{config.EMBED_MODEL_NAME}\0{text}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return f"{filename}:{digest}"
+
+
+def load_documents(data_dir):
+    """Return (ids, documents, metadatas) for every chunk, deduplicated by id."""
+    ids, docs, metas = [], [], []
+    seen = set()
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(data_dir, filename), encoding="utf-8") as f:
+            entries = json.load(f)
+        for text, meta in chunk_entries(filename, entries):
+            _id = doc_id(filename, text)
+            if _id in seen:
+                continue
+            seen.add(_id)
+            ids.append(_id)
+            docs.append(text)
+            metas.append(meta)
+    return ids, docs, metas
+
+
+# ============================================================================
+# MANIFEST
+# ============================================================================
+
+def store_path(backend):
+    if backend == "chroma":
+        return config.CHROMA_PATH
+    if backend == "numpy":
+        return config.NUMPY_INDEX_PATH
+    raise ValueError(f"Unknown retrieval backend: {backend!r}")
+
+
+def _manifest_key(backend):
+    return {
+        "backend": backend,
+        "collection": config.COLLECTION_NAME if backend == "chroma" else None,
+        "embed_model": config.EMBED_MODEL_NAME,
+        "doc_format": DOC_FORMAT,
+    }
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(path, manifest):
+    os.makedirs(path, exist_ok=True)
+    tmp = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(path, MANIFEST_FILE))
+
+
+def is_up_to_date(backend=None, data_dir=None):
+    """True if the manifest says the store already matches dnd_data/."""
+    backend = backend or config.RETRIEVAL_BACKEND
+    data_dir = data_dir or config.DATA_DIR
+    manifest = read_manifest(store_path(backend))
+    return (manifest is not None
+            and manifest.get("key") == _manifest_key(backend)
+            and manifest.get("files") == file_hashes(data_dir))
+
+
+# ============================================================================
+# SYNC
+# ============================================================================
+
+def _embed_in_batches(embed_model, docs, batch_size):
+    out = []
+    for start in range(0, len(docs), batch_size):
+        out.extend(embed_model.encode(docs[start:start + batch_size]).tolist())
+    return out
+
+
+def _sync_chroma(path, ids, docs, metas, get_embed_model, batch_size, reset=False):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    if reset:
+        try:
+            client.delete_collection(config.COLLECTION_NAME)
+        except Exception:
+            pass  # nothing to drop yet
+    collection = client.get_or_create_collection(config.COLLECTION_NAME)
+    existing = set(collection.get(include=[])["ids"])
+    wanted = dict(zip(ids, range(len(ids))))
+
+    new = [i for i in ids if i not in existing]
+    stale = sorted(existing - wanted.keys())
+
+    if new:
+        embed_model = get_embed_model()
+        for start in range(0, len(new), batch_size):
+            batch = new[start:start + batch_size]
+            batch_docs = [docs[wanted[i]] for i in batch]
+            collection.upsert(
+                ids=batch,
+                documents=batch_docs,
+                embeddings=embed_model.encode(batch_docs).tolist(),
+                metadatas=[metas[wanted[i]] for i in batch],
+            )
+    if stale:
+        collection.delete(ids=stale)
+    return len(new), len(stale)
+
+
+def _sync_numpy(path, ids, docs, metas, get_embed_model, batch_size, reset=False):
+    import numpy as np
+    from vector_index import NumpyIndex
+
+    reuse = {}
+    if not reset and NumpyIndex.exists(path):
+        old = NumpyIndex(path)
+        reuse = {i: row for row, i in enumerate(old.ids)}
+        old_embeddings = old.embeddings
+        stale = len(set(old.ids) - set(ids))
+    else:
+        old_embeddings = None
+        stale = 0
+
+    new = [n for n, i in enumerate(ids) if i not in reuse]
+    new_vectors = []
+    if new:
+        new_vectors = _embed_in_batches(get_embed_model(), [docs[n] for n in new], batch_size)
+
+    if not new and not stale:
+        return 0, 0
+
+    rows = []
+    fresh = iter(new_vectors)
+    for i in ids:
+        rows.append(old_embeddings[reuse[i]] if i in reuse else next(fresh))
+    matrix = np.array(rows, dtype=np.float32) if rows else np.zeros((0, 0), np.float32)
+    NumpyIndex.write(path, ids, docs, matrix, metas)
+    return len(new), stale
+
+
+def sync_index(backend=None, get_embed_model=None, force=False, batch_size=64, data_dir=None):
+    """
+    Bring the vector store for `backend` in line with dnd_data/.
+
+    Only documents whose content hash isn't stored yet are embedded (in
+    batches of `batch_size`), ids that no longer exist are deleted, and a
+    manifest is written so the next unchanged run is a no-op.
+
+    get_embed_model: zero-arg callable returning a SentenceTransformer; only
+    called if something actually needs embedding.
+
+    Returns a summary dict.
+    """
+    backend = backend or config.RETRIEVAL_BACKEND
+    data_dir = data_dir or config.DATA_DIR
+    path = store_path(backend)
+    started = time.perf_counter()
+
+    hashes = file_hashes(data_dir)
+    manifest = read_manifest(path)
+    if (not force and manifest is not None
+            and manifest.get("key") == _manifest_key(backend)
+            and manifest.get("files") == hashes):
+        return {"backend": backend, "changed": False, "added": 0, "deleted": 0,
+                "documents": manifest.get("documents", 0),
+                "seconds": round(time.perf_counter() - started, 4)}
+
+    if get_embed_model is None:
+        def get_embed_model():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(config.EMBED_MODEL_NAME)
+
+    # A store built under another key (e.g. a different embedding model) is
+    # rebuilt from scratch rather than diffed, so old vectors never survive.
+    reset = manifest is not None and manifest.get("key") != _manifest_key(backend)
+    ids, docs, metas = load_documents(data_dir)
+    sync = _sync_chroma if backend == "chroma" else _sync_numpy
+    added, deleted = sync(path, ids, docs, metas, get_embed_model, batch_size, reset=reset)
+
+    write_manifest(path, {
+        "key": _manifest_key(backend),
+        "files": hashes,
+        "documents": len(ids),
+        "built_at": time.time(),
+    })
+    return {"backend": backend, "changed": True, "added": added, "deleted": deleted,
+            "documents": len(ids), "seconds": round(time.perf_counter() - started, 4)}
@@ -0,0 +1,386 @@
+# jobs.py
+# Background job queue for character analyses.
+#
+# POST /jobs puts a job on a bounded asyncio queue and returns its id at
+# once; a fixed set of worker tasks on the event loop run the pipeline
+# stages (retrieval, the streamed Claude call, parsing, the PDF render) and
+# record progress on the job, which GET /jobs/{id} reports. When the queue is
+# full submit() raises JobQueueFull with a Retry-After estimate instead of
+# queueing more work than the workers can get through. Finished jobs are
+# kept for JOB_TTL_SECONDS so clients can collect their results, except
+# /analyze download jobs: nobody can collect those once /analyze has sent
+# the PDF, so they are dropped, bytes and all, when their last waiter
+# releases them.
+#
+# Identical requests are coalesced: while a job for the same normalized
+# description and options is queued or running, submit() returns that job
+# and counts one more waiter on it instead of starting another. Each waiter
+# calls release() when it stops caring (a closed connection, DELETE
+# /jobs/{id}); the job is only cancelled, upstream Claude call included,
+# when its last waiter has gone.
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+
+import agent
+import config
+import metrics
+import pipeline
+from cache import normalize_description
+from json_stream import TopLevelFieldParser
+from render_pool import RenderPoolFull
+
+# Top-level character fields published on the job as soon as they are complete
+PREVIEW_FIELDS = ("name", "race", "classes", "background", "alignment", "backstory")
+
+
+class JobQueueFull(RuntimeError):
+    """submit() was called with max_queue jobs already waiting."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many character requests queued")
+        self.retry_after = retry_after
+
+
+class JobFailed(RuntimeError):
+    """A job ended with an error; error holds the response body for it."""
+
+    def __init__(self, error):
+        super().__init__(error.get("error", "Job failed"))
+        self.error = error
+
+
+def job_key(description, flatten=False, download=False):
+    """Requests with the same key share one job while it is in flight."""
+    normalized = normalize_description(description)
+    return hashlib.sha256(f"{flatten:d}{download:d}\0{normalized}".encode()).hexdigest()
+
+
+class Job:
+    """One analysis: its options, progress and outcome."""
+
+    def __init__(self, description, flatten=False, download=False):
+        self.id = uuid.uuid4().hex
+        self.key = job_key(description, flatten, download)
+        self.description = description
+        self.flatten = flatten
+        self.download = download  # keep the PDF bytes on the job instead of storing them
+        self.waiters = 1  # requests sharing this job that haven't released it
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.stage = "queued"
+        self.fields = {}
+        self.result = None
+        self.error = None
+        self.pdf = None
+        self.character = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._changed = asyncio.Event()
+        self._task = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def _update(self, **attrs):
+        for name, value in attrs.items():
+            setattr(self, name, value)
+        # Wake everyone waiting for a change, then arm a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def changed(self):
+        """asyncio.Event set on the next change to the job's status, stage or fields."""
+        return self._changed
+
+    async def wait(self):
+        """Wait until the job is done; return its result or raise JobFailed."""
+        while not self.done:
+            await self.changed().wait()
+        if self.status == "cancelled":
+            raise JobFailed({"error": "Job cancelled"})
+        if self.status == "failed":
+            raise JobFailed(self.error)
+        return self.result
+
+    def to_dict(self, position=None):
+        out = {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "waiters": self.waiters,
+            "fields": self.fields,
+            "created": self.created,
+        }
+        if position is not None:
+            out["position"] = position
+        if self.started is not None:
+            out["started"] = self.started
+        if self.finished is not None:
+            out["finished"] = self.finished
+            out["seconds"] = round(self.finished - (self.started or self.created), 3)
+        if self.result is not None:
+            out["result"] = self.result
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+async def _render(job, character):
+    # The queue already bounds how many renders run, so a full render pool
+    # is waited out rather than failing the job
+    while True:
+        try:
+            if job.download:
+                return await pipeline.render_sheet_bytes(character, flatten=job.flatten)
+            return await pipeline.render_sheet(character, flatten=job.flatten)
+        except RenderPoolFull:
+            await asyncio.sleep(0.2)
+
+
+async def run_job(job):
+    """Run every stage for one job, recording progress and the outcome on it."""
+    job._update(status="running", stage="generating", started=time.time())
+    parser = TopLevelFieldParser()
+    parts = []
+    try:
+        async for chunk in pipeline.stream_person(job.description):
+            parts.append(chunk)
+            if parser is None:
+                continue
+            try:
+                fields = parser.feed(chunk)
+            except json.JSONDecodeError:
+                parser = None  # malformed stream; fall back to the final parse
+                continue
+            preview = {key: value for key, value in fields if key in PREVIEW_FIELDS}
+            if preview:
+                job._update(fields={**job.fields, **preview})
+    except Exception as e:
+        metrics.ERRORS.inc("generate")
+        job._update(status="failed", finished=time.time(),
+                    error={"error": "Failed to generate character", "details": str(e)})
+        return
+
+    text = "".join(parts)
+    try:
+        character = pipeline.parse_character(text)
+    except json.JSONDecodeError:
+        job._update(status="failed", finished=time.time(),
+                    error={"error": "Failed to parse character sheet",
+                           "raw": agent.strip_code_fences(text)})
+        return
+
+    job._update(stage="rendering", character=character,
+                fields={key: character[key] for key in PREVIEW_FIELDS if key in character})
+    try:
+        rendered = await _render(job, character)
+        result = {
+            "char_race": character['race']['name'],
+            "class_name": character['classes'][0]['name'],
+            "backstory": character['backstory'],
+            "charName": character['name'],
+        }
+    except Exception as e:
+        job._update(status="failed", finished=time.time(),
+                    error={"error": "Failed to generate PDF", "details": str(e)})
+        return
+    if job.download:
+        job._update(status="done", stage="done", finished=time.time(), pdf=rendered,
+                    result=result)
+    else:
+        job._update(status="done", stage="done", finished=time.time(),
+                    result={"pdf_url": f"/pdf/{rendered}.pdf", **result})
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+class JobQueue:
+    """
+    Bounded queue of jobs worked off by a fixed pool of asyncio tasks.
+
+    workers:   jobs run at the same time
+    max_queue: jobs waiting to start before submit() raises JobQueueFull
+    ttl:       seconds a finished job is kept for GET /jobs/{id}
+    """
+
+    def __init__(self, workers=None, max_queue=None, ttl=None):
+        self.workers = workers or config.JOB_WORKERS
+        self.max_queue = max_queue or config.JOB_QUEUE_DEPTH
+        self.ttl = config.JOB_TTL_SECONDS if ttl is None else ttl
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self._jobs = {}  # id -> Job, in submission order
+        self._inflight = {}  # job key -> queued or running Job
+        self._queue = None
+        self._tasks = []
+        self._run_seconds = []  # recent job durations, for Retry-After
+
+    def start(self):
+        """Start the worker tasks (call from the running event loop)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+                       for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, description, flatten=False, download=False):
+        """
+        Queue a job and return it, or join the identical job already in
+        flight; raises JobQueueFull when a new job doesn't fit in the queue.
+        Every call must be paired with a release() of the returned job.
+        """
+        self.start()
+        self._prune()
+        job = self._inflight.get(job_key(description, flatten, download))
+        if job is not None:
+            job.waiters += 1
+            self.coalesced += 1
+            return job
+        job = Job(description, flatten, download)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull(self.retry_after()) from None
+        self._jobs[job.id] = job
+        self._inflight[job.key] = job
+        self.submitted += 1
+        return job
+
+    def release(self, job):
+        """
+        Drop one waiter from a job. When the last one leaves before the job
+        has finished it is cancelled: taken off the queue, or its pipeline
+        task (and with it the Claude call) cancelled. A finished download
+        job is forgotten along with its PDF bytes.
+        """
+        if job.waiters == 0:
+            return
+        job.waiters -= 1
+        if job.waiters:
+            return
+        if job.done:
+            if job.download:
+                self._jobs.pop(job.id, None)
+                job.pdf = job.character = None
+            return
+        self._forget(job)
+        if job._task is not None:
+            job._task.cancel()  # the worker marks it cancelled
+        else:
+            job._update(status="cancelled", stage="cancelled", finished=time.time())
+            self.cancelled += 1
+
+    def _forget(self, job):
+        # New requests stop joining the job once it has finished or been abandoned
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+            metrics.JOB_WAITERS.remove(job.key[:12])
+
+    def get(self, job_id):
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def position(self, job):
+        """Jobs ahead of a queued job (0: next to start), None once it runs."""
+        if job.status != "queued":
+            return None
+        ahead = 0
+        for other in self._jobs.values():
+            if other is job:
+                return ahead
+            if other.status == "queued":
+                ahead += 1
+        return None
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely to free up (at least 1)."""
+        # With every worker busy a job finishes, and a slot opens, about
+        # every average/workers seconds
+        recent = self._run_seconds
+        average = sum(recent) / len(recent) if recent else 5.0
+        return max(1, round(average / self.workers))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.status == "cancelled":  # every waiter left while it was queued
+                self._queue.task_done()
+                continue
+            job._task = asyncio.create_task(run_job(job))
+            try:
+                # wait() leaves job._task alone if this worker is the one cancelled
+                await asyncio.wait({job._task})
+            except asyncio.CancelledError:
+                job._task.cancel()
+                raise
+            finally:
+                self._queue.task_done()
+                self._forget(job)
+            if job._task.cancelled():
+                job._update(status="cancelled", stage="cancelled", finished=time.time())
+                self.cancelled += 1
+                continue
+            if job._task.exception() is not None:  # run_job records its own errors
+                job._update(status="failed", finished=time.time(),
+                            error={"error": "Job crashed",
+                                   "details": str(job._task.exception())})
+            if job.status == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._run_seconds = self._run_seconds[-49:] + [job.finished - job.started]
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def collect_metrics(self):
+        """Copy the queue's counters into metrics (a metrics collector)."""
+        stats = self.stats()
+        metrics.QUEUE_DEPTH.set(stats["queued"], "jobs")
+        metrics.IN_FLIGHT.set(stats["running"], "jobs")
+        for key, waiters in stats["inflight"].items():
+            metrics.JOB_WAITERS.set(waiters, key)
+        for outcome in ("submitted", "rejected", "completed", "failed", "cancelled", "coalesced"):
+            metrics.JOBS.set(stats[outcome], outcome)
+
+    def stats(self):
+        running = sum(1 for job in self._jobs.values() if job.status == "running")
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": running,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "coalesced": self.coalesced,
+            # Waiters per in-flight job, by a prefix of its key
+            "inflight": {key[:12]: job.waiters for key, job in self._inflight.items()},
+        }
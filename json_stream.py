@@ -0,0 +1,74 @@
+# json_stream.py
+# Incremental parser for a streamed JSON object.
+#
+# Feed it text as it arrives from the model; it yields each top-level
+# (key, value) pair of the root object as soon as that member is complete,
+# without waiting for the rest of the document. Anything before the first
+# "{" (e.g. a ```json fence) is ignored.
+import json
+
+
+class TopLevelFieldParser:
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        """Consume a chunk of text; return a list of newly completed (key, value) pairs."""
+        if self.done or not chunk:
+            return []
+        self._text += chunk
+        out = []
+        text = self._text
+        for pos in range(self._pos, len(text)):
+            ch = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None and self._key is None:
+                        self._key = json.loads(text[self._key_start:pos + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = pos
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    self._emit(text, pos, out)
+                    self._depth = 0
+                    self.done = True
+                    self._pos = pos + 1
+                    return out
+                self._depth -= 1
+            elif self._depth == 1:
+                if ch == ":" and self._key is not None and self._value_start is None:
+                    self._value_start = pos + 1
+                elif ch == ",":
+                    self._emit(text, pos, out)
+
+        self._pos = len(text)
+        return out
+
+    def _emit(self, text, end, out):
+        if self._key is not None and self._value_start is not None:
+            raw = text[self._value_start:end].strip()
+            if raw:
+                out.append((self._key, json.loads(raw)))
+        self._key_start = None
+        self._key = None
+        self._value_start = None
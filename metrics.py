@@ -0,0 +1,217 @@
+# metrics.py
+# Prometheus metrics for the web app, rendered by GET /metrics.
+#
+# A few counters, gauges and histograms in the Prometheus text format,
+# without the prometheus_client dependency. Recording is a dict lookup and
+# an add under a lock (a bisect too for histograms), so stages can be timed
+# on every request. Values other modules already count (cache hits, queue
+# depth, token usage) are read when /metrics is scraped through collectors
+# instead of being counted twice.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans a field-value build (~20 µs) up to a slow Claude call
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_registry = []
+_collectors = []
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, values, "", value) for values, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, values, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labels, values, extra)} "
+                         f"{_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. errors_total."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        if not self.labels:
+            self._values[()] = 0  # exported as 0 before the first inc()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value, *labels):
+        # For collectors copying a total another module keeps
+        with self._lock:
+            self._values[labels] = value
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def remove(self, *labels):
+        # Stop exporting one series, e.g. a per-key gauge whose key is gone
+        with self._lock:
+            self._values.pop(labels, None)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies) over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the seconds spent in the with block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _samples(self):
+        with self._lock:
+            series = [(values, list(counts), total, count)
+                      for values, (counts, total, count) in self._values.items()]
+        samples = []
+        for values, counts, total, count in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                samples.append((f"{self.name}_bucket", values,
+                                f'le="{_format_value(float(bound))}"', cumulative))
+            samples.append((f"{self.name}_sum", values, "", total))
+            samples.append((f"{self.name}_count", values, "", count))
+        return samples
+
+
+def add_collector(fn):
+    """Call fn() before every render, to copy values kept elsewhere into metrics."""
+    _collectors.append(fn)
+    return fn
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500  # unless a response starts
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; its path
+            # template keeps ids out of the labels
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                         scope["method"], route, str(status))
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:  # a broken collector shouldn't take /metrics down
+            print(f"Metrics collector {collect.__name__} failed: {e}")
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+STAGE_SECONDS = Histogram(
+    "dnd_stage_seconds",
+    "Time spent in each pipeline stage (embed, vector_query, llm, parse, "
+    "build_field_values, fill, write, render)",
+    ["stage"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "dnd_http_request_seconds", "HTTP request latency by route and status",
+    ["method", "route", "status"])
+HTTP_IN_FLIGHT = Gauge("dnd_http_requests_in_flight", "HTTP requests being handled")
+ERRORS = Counter("dnd_errors_total", "Failed pipeline stages", ["stage"])
+PARSE_FAILURES = Counter("dnd_parse_failures_total",
+                         "Model outputs that were not valid character JSON")
+CACHE_HITS = Counter("dnd_cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = Counter("dnd_cache_misses_total", "Cache misses", ["cache"])
+QUEUE_DEPTH = Gauge("dnd_queue_depth", "Work waiting to start", ["queue"])
+IN_FLIGHT = Gauge("dnd_in_flight", "Work running right now", ["stage"])
+JOBS = Counter("dnd_jobs_total", "Analysis jobs by outcome", ["outcome"])
+JOB_WAITERS = Gauge("dnd_job_waiters",
+                    "Requests waiting on each in-flight job, by a prefix of its key",
+                    ["key"])
+LLM_TOKENS = Counter("dnd_llm_tokens_total", "Claude tokens by kind", ["kind"])
+LLM_REQUESTS = Counter("dnd_llm_requests_total", "Claude calls that returned usage")
@@ -0,0 +1,282 @@
+# pipeline.py
+# Async request pipeline used by the web app.
+#
+# Each stage runs where it can't block the event loop: embedding/retrieval in
+# a small thread pool, the Claude call on the AsyncAnthropic client behind a
+# semaphore, and PDF filling in a thread pool or a render_pool.RenderPool of
+# worker processes. Pool sizes come from config (DND_EMBED_CONCURRENCY,
+# DND_LLM_CONCURRENCY, DND_PDF_CONCURRENCY). Sheets for the web app go into
+# a content-addressed sheet_store.SheetStore. Every stage is timed into
+# metrics.STAGE_SECONDS.
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import agent
+import config
+import metrics
+from dnd_pdf_filler_simple import generate_character
+from dnd_pdf_filler_simple.generate_character import (
+    NEW_FILE_MODE, render_character_sheet, sheet_cache,
+)
+from render_pool import RenderPool, RenderPoolFull
+from sheet_store import SheetStore
+
+SHEETS_DIR = config.SHEETS_DIR
+
+sheet_cache.max_items = config.PDF_CACHE_ITEMS
+sheet_cache.max_bytes = config.PDF_CACHE_BYTES
+
+_lock = threading.Lock()
+_embed_executor = None
+_pdf_executor = None
+_llm_semaphore = None
+_sheet_store = None
+
+
+# ============================================================================
+# EXECUTORS
+# ============================================================================
+
+def _embed_pool():
+    global _embed_executor
+    if _embed_executor is None:
+        with _lock:
+            if _embed_executor is None:
+                _embed_executor = ThreadPoolExecutor(
+                    max_workers=config.EMBED_CONCURRENCY, thread_name_prefix="embed")
+    return _embed_executor
+
+
+def _pdf_pool():
+    global _pdf_executor
+    if _pdf_executor is None:
+        with _lock:
+            if _pdf_executor is None:
+                if config.PDF_EXECUTOR == "process":
+                    _pdf_executor = RenderPool()
+                else:
+                    _pdf_executor = ThreadPoolExecutor(
+                        max_workers=config.PDF_CONCURRENCY, thread_name_prefix="pdf")
+    return _pdf_executor
+
+
+def _llm_slots():
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(config.LLM_CONCURRENCY)
+    return _llm_semaphore
+
+
+def sheet_store():
+    """The SheetStore rendered sheets are kept in (created on first use)."""
+    global _sheet_store
+    if _sheet_store is None:
+        with _lock:
+            if _sheet_store is None:
+                _sheet_store = SheetStore(SHEETS_DIR)
+    return _sheet_store
+
+
+def shutdown():
+    """Stop the stage executors and the sheet sweeper (called when the app shuts down)."""
+    global _embed_executor, _pdf_executor, _llm_semaphore
+    with _lock:
+        for pool in (_embed_executor, _pdf_executor):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _embed_executor = _pdf_executor = _llm_semaphore = None
+        if _sheet_store is not None:
+            _sheet_store.stop_sweeper()
+
+
+async def _in_pool(pool, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _observe_render_stage(stage, seconds):
+    metrics.STAGE_SECONDS.observe(seconds, stage)
+
+
+# build_field_values / fill / write timings from every render in this
+# process (and, through RenderPool, from its workers)
+generate_character.stage_observer = _observe_render_stage
+
+
+@asynccontextmanager
+async def _llm_call():
+    # One Claude call: waits for an LLM slot (counted as queued), then is
+    # timed and counted as in flight until the with block ends
+    metrics.QUEUE_DEPTH.inc("llm")
+    waiting = True
+    try:
+        async with _llm_slots():
+            metrics.QUEUE_DEPTH.dec("llm")
+            waiting = False
+            metrics.IN_FLIGHT.inc("llm")
+            try:
+                with metrics.STAGE_SECONDS.time("llm"):
+                    yield
+            except Exception:
+                metrics.ERRORS.inc("llm")
+                raise
+            finally:
+                metrics.IN_FLIGHT.dec("llm")
+    finally:
+        if waiting:
+            metrics.QUEUE_DEPTH.dec("llm")
+
+
+@asynccontextmanager
+async def _rendering():
+    # A whole render as the caller sees it: pool wait, PDF and storing it.
+    # Attempts turned away by a full pool aren't timed: they return at once
+    # and would drag the histogram down exactly when the pool is saturated.
+    metrics.IN_FLIGHT.inc("render")
+    started = time.perf_counter()
+    try:
+        yield
+    except RenderPoolFull:
+        raise  # load shedding, not a failure
+    except Exception:
+        metrics.ERRORS.inc("render")
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "render")
+        raise
+    else:
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "render")
+    finally:
+        metrics.IN_FLIGHT.dec("render")
+
+
+@metrics.add_collector
+def _collect_metrics():
+    if config.CACHE_ENABLED:
+        cache = agent.get_cache()
+        metrics.CACHE_HITS.set(cache.hits, "analysis")
+        metrics.CACHE_MISSES.set(cache.misses, "analysis")
+    metrics.CACHE_HITS.set(sheet_cache.hits, "pdf")
+    metrics.CACHE_MISSES.set(sheet_cache.misses, "pdf")
+    pool = pdf_stats()
+    if pool is not None:
+        metrics.QUEUE_DEPTH.set(pool["pending"], "render_pool")
+    usage = agent.usage_stats()
+    metrics.LLM_REQUESTS.set(usage["requests"])
+    for kind in ("input_tokens", "output_tokens",
+                 "cache_creation_input_tokens", "cache_read_input_tokens"):
+        metrics.LLM_TOKENS.set(usage[kind], kind)
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+async def retrieve_context(description):
+    return await _in_pool(_embed_pool(), agent.retrieve_context, description)
+
+
+async def stream_person(description):
+    """Async generator over the model output as it is produced."""
+    cached = await asyncio.to_thread(agent.cached_result, description)
+    if cached is not None:
+        yield cached
+        return
+
+    context = await retrieve_context(description)
+    params = agent.request_params(description, context)
+    parts = []
+    async with _llm_call():
+        async with agent.get_async_claude().messages.stream(**params) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                yield text
+            agent.record_usage((await stream.get_final_message()).usage)
+    await asyncio.to_thread(agent.cache_result, description, "".join(parts))
+
+
+def parse_character(text):
+    """Strip code fences and parse; raises json.JSONDecodeError."""
+    with metrics.STAGE_SECONDS.time("parse"):
+        try:
+            return json.loads(agent.strip_code_fences(text))
+        except json.JSONDecodeError:
+            metrics.PARSE_FAILURES.inc()
+            raise
+
+
+def pdf_options(flatten):
+    """Output-mode keyword arguments for render_character_sheet()."""
+    return {"incremental": not flatten and config.PDF_OUTPUT == "incremental",
+            "flatten": flatten}
+
+
+def pdf_stats():
+    """Render pool counters, or None when sheets are rendered on threads."""
+    pool = _pdf_executor
+    return pool.stats() if isinstance(pool, RenderPool) else None
+
+
+def pdf_cache_stats():
+    """Hit rate and size of the rendered-sheet cache."""
+    return sheet_cache.stats()
+
+
+def sheet_bytes(character, flatten=False):
+    """Render the character's PDF in memory and return its bytes."""
+    return render_character_sheet(character, **pdf_options(flatten))
+
+
+def _store(sheets_dir, filename, write):
+    os.makedirs(sheets_dir, exist_ok=True)
+    # Write into a temp file next to the target and rename it, so readers
+    # never see a half-written sheet.
+    fd, tmp_path = tempfile.mkstemp(dir=sheets_dir, prefix=".render-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.chmod(tmp_path, NEW_FILE_MODE)  # mkstemp() creates files 0600
+        os.replace(tmp_path, os.path.join(sheets_dir, filename))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return filename
+
+
+def save_sheet(pdf, sheets_dir, filename):
+    """Store already rendered PDF bytes as sheets_dir/filename."""
+    return _store(sheets_dir, filename, lambda f: f.write(pdf))
+
+
+def store_sheet(character, flatten=False):
+    """Render the character's PDF into the sheet store and return its sheet id."""
+    return sheet_store().put_stream(
+        lambda f: render_character_sheet(character, f, **pdf_options(flatten)))
+
+
+async def render_sheet(character, flatten=False):
+    """
+    Render into the sheet store and return the sheet id (served at
+    /pdf/<id>); raises render_pool.RenderPoolFull when saturated.
+    """
+    pool = _pdf_pool()
+    async with _rendering():
+        if isinstance(pool, RenderPool):
+            pdf = await pool.render(character, **pdf_options(flatten))
+            return await asyncio.to_thread(sheet_store().put, pdf)
+        return await _in_pool(pool, store_sheet, character, flatten)
+
+
+async def render_sheet_bytes(character, flatten=False):
+    pool = _pdf_pool()
+    async with _rendering():
+        if isinstance(pool, RenderPool):
+            return await pool.render(character, **pdf_options(flatten))
+        return await _in_pool(pool, sheet_bytes, character, flatten)
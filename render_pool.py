@@ -0,0 +1,198 @@
+# render_pool.py
+# Process pool that turns character dicts into PDF bytes.
+#
+# PyPDF2 is pure Python, so sheets filled on threads serialize behind the GIL.
+# RenderPool runs them in worker processes that each parse the template once
+# at start-up (preload_template) instead of per job. The number of jobs queued
+# or running is capped: submit() raises RenderPoolFull past max_queue, so the
+# web app can shed load instead of growing an unbounded backlog. Workers are
+# recycled to keep memory growth bounded: after workers * max_tasks_per_child
+# jobs a fresh executor takes new work while the old one drains and exits.
+# (ProcessPoolExecutor's own max_tasks_per_child can hang on Python 3.11.)
+# Identical sheets are answered from a SheetCache in this process, so repeats
+# never reach a worker. Workers send their per-stage render timings back with
+# each PDF, and the parent reports them to its own stage_observer.
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+from dnd_pdf_filler_simple import generate_character
+from dnd_pdf_filler_simple.generate_character import (
+    preload_template, render_character_sheet, sheet_cache, sheet_key,
+)
+
+
+class RenderPoolFull(RuntimeError):
+    """submit() was called with max_queue jobs already queued or running."""
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+_worker_pdf_path = None
+_worker_stages = []  # (stage, seconds) of the render in progress
+
+
+def _init_worker(pdf_path, preload_incremental):
+    global _worker_pdf_path
+    _worker_pdf_path = pdf_path
+    generate_character.stage_observer = lambda stage, seconds: _worker_stages.append(
+        (stage, seconds))
+    preload_template(pdf_path, incremental=preload_incremental)
+
+
+def _render(character, incremental, flatten):
+    # Returns (pdf bytes, render seconds, stage timings); the parent does the caching
+    _worker_stages.clear()
+    started = time.perf_counter()
+    pdf = render_character_sheet(character, incremental=incremental, flatten=flatten,
+                                 pdf_path=_worker_pdf_path, cache=None)
+    return pdf, time.perf_counter() - started, list(_worker_stages)
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+def _mp_context():
+    # Forking the threaded web server is unsafe; the forkserver imports
+    # PyPDF2 and the generator once and forks fresh workers from that.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["dnd_pdf_filler_simple.generate_character"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+class RenderPool:
+    """
+    Worker processes rendering character sheets to PDF bytes.
+
+    workers:             number of worker processes
+    max_queue:           jobs queued or running before submit() refuses more
+    max_tasks_per_child: average jobs per worker before the workers are
+                         replaced (0: never)
+    preload_incremental: also parse the template for incremental output at
+                         worker start-up
+    pdf_path:            template to fill (default: the bundled sheet)
+    cache:               SheetCache checked before submitting (default: the
+                         process-wide sheet_cache; None disables it)
+    """
+
+    def __init__(self, workers=None, max_queue=None, max_tasks_per_child=None,
+                 preload_incremental=None, pdf_path=None, cache=sheet_cache):
+        self.workers = workers or config.PDF_CONCURRENCY
+        self.max_queue = max_queue or config.PDF_QUEUE_DEPTH
+        if max_tasks_per_child is None:
+            max_tasks_per_child = config.PDF_MAX_TASKS_PER_CHILD
+        self.max_tasks_per_child = max_tasks_per_child
+        if preload_incremental is None:
+            preload_incremental = config.PDF_OUTPUT == "incremental"
+        self._initargs = (pdf_path, preload_incremental)
+        self.pdf_path = pdf_path
+        self.cache = cache
+        self.submitted = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.recycles = 0
+        self._pending = 0  # queued or running
+        self._executor_jobs = 0  # submitted to the current executor
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=_mp_context(),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    def submit(self, character, incremental=False, flatten=False):
+        """
+        Queue one render and return a concurrent.futures.Future of the PDF
+        bytes. Raises RenderPoolFull when max_queue jobs are pending.
+        A sheet already in the cache comes back as a finished future.
+        """
+        key = None
+        if self.cache is not None and self.cache.max_items:
+            key = sheet_key(character, incremental, flatten, self.pdf_path)
+            pdf = self.cache.get(key)
+            if pdf is not None:
+                result = Future()
+                result.set_result(pdf)
+                return result
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise RenderPoolFull(f"{self.max_queue} PDF renders already queued")
+            if (self.max_tasks_per_child
+                    and self._executor_jobs >= self.workers * self.max_tasks_per_child):
+                # The old executor finishes its queued jobs, then its workers exit
+                self._executor.shutdown(wait=False)
+                self._executor = self._new_executor()
+                self._executor_jobs = 0
+                self.recycles += 1
+            try:
+                future = self._executor.submit(_render, character, incremental, flatten)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start over with a fresh pool
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                self._executor_jobs = 0
+                self.restarts += 1
+                future = self._executor.submit(_render, character, incremental, flatten)
+            self._pending += 1
+            self._executor_jobs += 1
+            self.submitted += 1
+        result = Future()
+        result.add_done_callback(lambda f: f.cancelled() and future.cancel())
+        future.add_done_callback(lambda f: self._job_done(f, result, key))
+        return result
+
+    def _job_done(self, future, result, key):
+        with self._lock:
+            self._pending -= 1
+        if future.cancelled():
+            result.cancel()
+            return
+        try:
+            if future.exception() is not None:
+                result.set_exception(future.exception())
+                return
+            pdf, seconds, stages = future.result()
+            observer = generate_character.stage_observer
+            if observer is not None:
+                for stage, stage_seconds in stages:
+                    observer(stage, stage_seconds)
+            if key is not None:
+                self.cache.put(key, pdf, seconds)
+            result.set_result(pdf)
+        except InvalidStateError:
+            pass  # the caller cancelled while the render was running
+
+    async def render(self, character, incremental=False, flatten=False):
+        """Async submit(): await the PDF bytes for one character."""
+        return await asyncio.wrap_future(self.submit(character, incremental, flatten))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "max_tasks_per_child": self.max_tasks_per_child,
+                "pending": self._pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "recycles": self.recycles,
+                "restarts": self.restarts,
+            }
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
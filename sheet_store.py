@@ -0,0 +1,242 @@
+# sheet_store.py
+# Content-addressed storage for rendered character sheets.
+#
+# Every sheet is written to a temp file in the store directory and renamed to
+# <sha256>.pdf once complete, so readers never see a partial file and two
+# requests rendering the same sheet end up sharing one file. Nothing is ever
+# deleted wholesale: a sweeper thread removes sheets older than the TTL and,
+# past the size cap, the least recently stored or served ones. It never
+# touches a sheet that is pinned (being written or served right now), newer
+# than min_age (just handed out and not downloaded yet), or a temp file that
+# may still be in the middle of a write.
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+import config
+
+_SHEET_ID = re.compile(r"[0-9a-f]{64}")
+_TEMP_PREFIX = ".render-"
+
+
+class _HashingWriter:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, f):
+        self._f = f
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class SheetStore:
+    """
+    Directory of PDFs named by the SHA-256 of their bytes.
+
+    directory:      where sheets are kept
+    ttl:            seconds a sheet is kept after it was last stored or served
+    max_bytes:      total size the sweeper trims the store down to (0: no cap)
+    min_age:        seconds a sheet is safe from either limit once stored or
+                    served (covers the gap until the client downloads it)
+    sweep_interval: seconds between background sweeps
+    """
+
+    def __init__(self, directory=None, ttl=None, max_bytes=None, min_age=None,
+                 sweep_interval=None):
+        self.directory = directory or config.SHEETS_DIR
+        self.ttl = config.SHEETS_TTL_SECONDS if ttl is None else ttl
+        self.max_bytes = config.SHEETS_MAX_BYTES if max_bytes is None else max_bytes
+        self.min_age = config.SHEETS_MIN_AGE_SECONDS if min_age is None else min_age
+        self.sweep_interval = sweep_interval or config.SHEETS_SWEEP_INTERVAL
+        self.stored = 0
+        self.deduplicated = 0
+        self.expired = 0
+        self.evicted = 0
+        self.sweeps = 0
+        self._pins = {}  # sheet id -> number of holders
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Reading and writing
+    # ------------------------------------------------------------------
+
+    def _path(self, sheet_id):
+        return os.path.join(self.directory, f"{sheet_id}.pdf")
+
+    def put(self, pdf):
+        """Store PDF bytes and return their sheet id."""
+        return self.put_stream(lambda f: f.write(pdf))
+
+    def put_stream(self, write):
+        """
+        Store the PDF that write(f) produces (f is a binary file object) and
+        return its sheet id.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=_TEMP_PREFIX, suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                hashing = _HashingWriter(f)
+                write(hashing)
+            sheet_id = hashing.hash.hexdigest()
+            with self._lock:
+                path = self._path(sheet_id)
+                if os.path.exists(path):
+                    # Same sheet already stored: keep it, restart its clock
+                    os.utime(path)
+                    os.unlink(tmp_path)
+                    self.deduplicated += 1
+                else:
+                    os.replace(tmp_path, path)
+                    self.stored += 1
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return sheet_id
+
+    def path(self, sheet_id):
+        """
+        File path of a stored sheet, or None for unknown or malformed ids.
+        Counts as a use: the sheet's TTL and min_age restart.
+        """
+        if not _SHEET_ID.fullmatch(sheet_id):
+            return None
+        path = self._path(sheet_id)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return path
+
+    def pin(self, sheet_id):
+        """Keep a sheet from being swept until unpin() (calls nest)."""
+        with self._lock:
+            self._pins[sheet_id] = self._pins.get(sheet_id, 0) + 1
+
+    def unpin(self, sheet_id):
+        with self._lock:
+            count = self._pins.get(sheet_id, 0) - 1
+            if count > 0:
+                self._pins[sheet_id] = count
+            else:
+                self._pins.pop(sheet_id, None)
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def _entries(self):
+        # (mtime, size, name) of every sheet and temp file in the directory
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.name))
+        return entries
+
+    def _remove(self, name, now, min_age):
+        # Delete one file unless it's pinned or was used within min_age;
+        # re-checked under the lock so a concurrent put()/path() wins
+        sheet_id = name[:-len(".pdf")]
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if sheet_id in self._pins:
+                return False
+            try:
+                if now - os.stat(path).st_mtime < min_age:
+                    return False
+                os.unlink(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def sweep(self, now=None):
+        """
+        Delete expired sheets, then the least recently used ones until the
+        store fits in max_bytes. Returns the number of files removed.
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        kept = []
+        for mtime, size, name in self._entries():
+            age = now - mtime
+            if name.startswith(_TEMP_PREFIX):
+                # A write in progress, unless it was abandoned long ago
+                if age > max(self.ttl, 3600) and self._remove(name, now, 0):
+                    removed += 1
+                continue
+            if age > self.ttl and self._remove(name, now, self.min_age):
+                self.expired += 1
+                removed += 1
+                continue
+            kept.append((mtime, size, name))
+
+        if self.max_bytes:
+            total = sum(size for _, size, _ in kept)
+            for mtime, size, name in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                if self._remove(name, now, self.min_age):
+                    self.evicted += 1
+                    removed += 1
+                    total -= size
+        self.sweeps += 1
+        return removed
+
+    def start_sweeper(self):
+        """Sweep now and then every sweep_interval seconds in a daemon thread."""
+        if self._sweeper is not None:
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="sheet-sweeper",
+                                         daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except OSError as e:
+                print(f"Sheet sweep failed: {e}")
+            if self._stop.wait(self.sweep_interval):
+                return
+
+    def stats(self):
+        entries = [e for e in self._entries() if not e[2].startswith(_TEMP_PREFIX)]
+        with self._lock:
+            pinned = len(self._pins)
+        return {
+            "sheets": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "pinned": pinned,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "sweeps": self.sweeps,
+        }
@@ -0,0 +1,120 @@
+# static_assets.py
+# Serves the page and the build_static.py output.
+#
+# index.html is read once and kept in memory (the built copy with hashed
+# asset URLs and its gzip/brotli versions when static/dist/ exists, the
+# source file otherwise). Hashed assets under /static/dist/ never change,
+# so they are sent with a one-year immutable Cache-Control, picking the
+# AVIF/WebP variant or the brotli/gzip copy the client accepts. The page
+# itself is revalidated on every load (no-cache + ETag) so a new build is
+# picked up at once.
+import hashlib
+import json
+import mimetypes
+import os
+
+from fastapi.responses import FileResponse, Response
+
+import config
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Preferred first
+IMAGE_FORMATS = ("image/avif", "image/webp")
+ENCODINGS = ("br", "gzip")
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check (weak comparison: W/ prefixes don't matter)."""
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _accepted(header):
+    # Media types or codings a request's Accept/Accept-Encoding allows (q > 0)
+    accepted = set()
+    for item in header.split(","):
+        value, _, params = item.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        if params and q.replace(".", "", 1).isdigit() and float(q) == 0:
+            continue
+        accepted.add(value.strip().lower())
+    return accepted
+
+
+def _pick(alternatives, preferred, header):
+    # (key, path) of the first preferred alternative the request accepts
+    accepted = _accepted(header)
+    for key in preferred:
+        if key in alternatives and key in accepted:
+            return key, alternatives[key]
+    return None, None
+
+
+class StaticAssets:
+    """The in-memory page and the hashed assets listed in dist/manifest.json."""
+
+    def __init__(self, dist_dir=None, index_path="index.html"):
+        self.dist_dir = dist_dir = dist_dir or config.STATIC_DIST_DIR
+        manifest_path = os.path.join(dist_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.assets = manifest["assets"]
+            index = manifest["index"]
+            self._index = {None: self._read(index["path"])}
+            for encoding, path in index["encodings"].items():
+                self._index[encoding] = self._read(path)
+        else:  # not built: the source page, unchanged
+            self.assets = {}
+            with open(index_path, "rb") as f:
+                self._index = {None: f.read()}
+        self.index_etag = f'"{hashlib.sha256(self._index[None]).hexdigest()[:32]}"'
+
+    @property
+    def built(self):
+        return bool(self.assets)
+
+    def _read(self, rel):
+        with open(os.path.join(self.dist_dir, rel), "rb") as f:
+            return f.read()
+
+    def index_response(self, headers):
+        """The page for a request with these headers."""
+        out = {"ETag": self.index_etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(headers.get("if-none-match", ""), self.index_etag):
+            return Response(status_code=304, headers=out)
+        encoding, body = _pick(self._index, ENCODINGS, headers.get("accept-encoding", ""))
+        if encoding is None:
+            body = self._index[None]
+        else:
+            out["Content-Encoding"] = encoding
+        return Response(body, media_type="text/html", headers=out)
+
+    def asset_response(self, rel, headers):
+        """A hashed asset, or None when rel isn't one."""
+        entry = self.assets.get(rel)
+        if entry is None:
+            return None
+        media_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        out = {"Cache-Control": IMMUTABLE}
+        path = rel
+        if entry.get("variants"):
+            out["Vary"] = "Accept"
+            variant, alt = _pick(entry["variants"], IMAGE_FORMATS, headers.get("accept", ""))
+            if variant is not None:
+                media_type, path = variant, alt
+        elif entry.get("encodings"):
+            out["Vary"] = "Accept-Encoding"
+            encoding, alt = _pick(entry["encodings"], ENCODINGS,
+                                  headers.get("accept-encoding", ""))
+            if encoding is not None:
+                out["Content-Encoding"] = encoding
+                path = alt
+        # The ETag names the file actually sent, so each variant validates separately
+        out["ETag"] = f'"{os.path.basename(path)}"'
+        if etag_matches(headers.get("if-none-match", ""), out["ETag"]):
+            return Response(status_code=304, headers=out)
+        return FileResponse(os.path.join(self.dist_dir, path), media_type=media_type,
+                            headers=out)
@@ -0,0 +1,130 @@
+# stub_anthropic.py
+# A tiny local stand-in for the Anthropic Messages API, for offline testing
+# and benchmarking. It answers POST /v1/messages with one of the example
+# characters and reports prompt-cache usage the way the real API does: the
+# prefix up to the last cache_control breakpoint is "written" the first time
+# it is seen and "read" afterwards.
+#
+#   uvicorn stub_anthropic:app --port 8100
+#   ANTHROPIC_BASE_URL=http://127.0.0.1:8100 ANTHROPIC_API_KEY=stub python app.py
+#
+# STUB_LATENCY_MS adds a fixed delay per call (time to first token) and
+# STUB_TOKENS_PER_SEC paces streamed responses ("stream": true).
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+EXAMPLES = sorted(glob.glob(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "dnd_pdf_filler_simple", "examples", "*.json")))
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "0"))
+TOKENS_PER_SEC = float(os.environ.get("STUB_TOKENS_PER_SEC", "0"))
+CHUNK_CHARS = 16
+
+app = FastAPI()
+_seen_prefixes = set()
+
+
+def _tokens(text):
+    # Rough stand-in for a tokenizer: ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+def _block_text(block):
+    if isinstance(block, str):
+        return block
+    return block.get("text", "")
+
+
+def _usage(body):
+    """Split input tokens into uncached / cache-write / cache-read like the real API."""
+    system = body.get("system") or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    blocks = list(system)
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            blocks.append({"type": "text", "text": content})
+        else:
+            blocks.extend(content)
+
+    breakpoint_at = -1
+    for i, block in enumerate(blocks):
+        if isinstance(block, dict) and block.get("cache_control"):
+            breakpoint_at = i
+
+    prefix = "".join(_block_text(b) for b in blocks[:breakpoint_at + 1])
+    rest = "".join(_block_text(b) for b in blocks[breakpoint_at + 1:])
+    usage = {"input_tokens": _tokens(rest), "output_tokens": 0,
+             "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+    if prefix:
+        key = hashlib.sha256(prefix.encode()).hexdigest()
+        if key in _seen_prefixes:
+            usage["cache_read_input_tokens"] = _tokens(prefix)
+        else:
+            _seen_prefixes.add(key)
+            usage["cache_creation_input_tokens"] = _tokens(prefix)
+    return usage
+
+
+def _character_text(body):
+    """Pick an example character deterministically from the request."""
+    last = body.get("messages", [{}])[-1].get("content", "")
+    if not isinstance(last, str):
+        last = "".join(_block_text(b) for b in last)
+    index = int(hashlib.sha256(last.encode()).hexdigest(), 16) % len(EXAMPLES)
+    with open(EXAMPLES[index], encoding="utf-8") as f:
+        return json.dumps(json.load(f), indent=2)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream(message, text):
+    usage = dict(message["usage"], output_tokens=1)
+    yield _sse("message_start", {"type": "message_start",
+                                 "message": dict(message, content=[], stop_reason=None, usage=usage)})
+    yield _sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                       "content_block": {"type": "text", "text": ""}})
+    delay = (CHUNK_CHARS / 4) / TOKENS_PER_SEC if TOKENS_PER_SEC else 0
+    for start in range(0, len(text), CHUNK_CHARS):
+        if delay:
+            await asyncio.sleep(delay)
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                           "delta": {"type": "text_delta",
+                                                     "text": text[start:start + CHUNK_CHARS]}})
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield _sse("message_delta", {"type": "message_delta",
+                                 "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                 "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    text = _character_text(body)
+    usage = _usage(body)
+    usage["output_tokens"] = _tokens(text)
+    message = {
+        "id": f"msg_stub_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "stub"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": usage,
+    }
+    if body.get("stream"):
+        return StreamingResponse(_stream(message, text), media_type="text/event-stream")
+    return message
@@ -0,0 +1,87 @@
+# vector_index.py
+# Exact in-process vector search over the D&D knowledge base.
+#
+# The corpus is a few hundred documents, so one matrix-vector product over a
+# memory-mapped float32 matrix beats a persistent HNSW index on both boot time
+# and query latency. query() mirrors Chroma's signature so agent.py can swap
+# backends without touching analyze_person.
+import json
+import os
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.json"
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row so a dot product is cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyIndex:
+    """Read-only index: ids/documents/metadatas in JSON, embeddings in .npy."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, DOCUMENTS_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.documents = meta["documents"]
+        self.metadatas = meta.get("metadatas") or [None] * len(self.ids)
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        if self.embeddings.shape[0] != len(self.ids):
+            raise ValueError(
+                f"{directory}: {self.embeddings.shape[0]} embeddings for {len(self.ids)} documents"
+            )
+
+    @classmethod
+    def exists(cls, directory):
+        return (os.path.isfile(os.path.join(directory, EMBEDDINGS_FILE))
+                and os.path.isfile(os.path.join(directory, DOCUMENTS_FILE)))
+
+    @classmethod
+    def write(cls, directory, ids, documents, embeddings, metadatas=None):
+        """Persist a new index atomically and return it opened."""
+        os.makedirs(directory, exist_ok=True)
+        matrix = normalize_rows(embeddings) if len(ids) else np.zeros((0, 0), np.float32)
+
+        emb_path = os.path.join(directory, EMBEDDINGS_FILE)
+        doc_path = os.path.join(directory, DOCUMENTS_FILE)
+        with open(emb_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(doc_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "documents": list(documents),
+                       "metadatas": list(metadatas) if metadatas else None}, f)
+        os.replace(emb_path + ".tmp", emb_path)
+        os.replace(doc_path + ".tmp", doc_path)
+        return cls(directory)
+
+    def count(self):
+        return len(self.ids)
+
+    def query(self, query_embeddings, n_results=10):
+        """Top-k by cosine similarity, returned in Chroma's result layout."""
+        queries = normalize_rows(query_embeddings)
+        k = min(n_results, len(self.ids))
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if k == 0:
+            for _ in range(len(queries)):
+                for key in out:
+                    out[key].append([])
+            return out
+
+        scores = queries @ self.embeddings.T  # (n_queries, n_docs)
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            out["ids"].append([self.ids[i] for i in top])
+            out["documents"].append([self.documents[i] for i in top])
+            out["metadatas"].append([self.metadatas[i] for i in top])
+            out["distances"].append([float(1.0 - row[i]) for i in top])
+        return out